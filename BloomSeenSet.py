@@ -0,0 +1,108 @@
+from hashlib import blake2b
+import base64
+import shutil
+import math
+import mmap
+import os
+
+
+# A fixed-size stand-in for the set of seen page titles. Membership tests may give
+# false positives at about error_rate once capacity titles are in, never false
+# negatives. The bits can live in a memory-mapped file so they don't count toward
+# the process's memory at all.
+class BloomSeenSet:
+    # a new filter starts empty, clearing any bits already in file_name
+    def __init__(self, capacity=1000000, error_rate=0.01, file_name=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.file_name = file_name
+        self.bit_count = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.count = 0
+        size = (self.bit_count + 7) // 8
+        self._file = None
+        if file_name is None:
+            self.bits = bytearray(size)
+        else:
+            with open(file_name, "wb") as bits_file:
+                bits_file.truncate(size)
+            self._file = open(file_name, "r+b")
+            self.bits = mmap.mmap(self._file.fileno(), size)
+
+    def __contains__(self, title):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(title)
+        )
+
+    # approximately the number of titles added, as repeats aren't counted
+    def __len__(self):
+        return self.count
+
+    def add(self, title):
+        is_new = False
+        for position in self._positions(title):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                is_new = True
+        if is_new:
+            self.count += 1
+
+    def update(self, titles):
+        for title in titles:
+            self.add(title)
+
+    # double hashing: the positions are h1 + i * h2 for i below hash_count
+    def _positions(self, title):
+        digest = blake2b(title.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.bit_count for i in range(self.hash_count)]
+
+    # what save_map writes to restore the filter later. File-backed bits are copied
+    # to bits_file_name, as the file they live in is reused by the next crawl; the
+    # others are embedded.
+    def to_state(self, bits_file_name=None):
+        state = {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "count": self.count,
+        }
+        if self.file_name is None or bits_file_name is None:
+            state["bits"] = base64.b64encode(bytes(self.bits)).decode("ascii")
+        else:
+            self.bits.flush()
+            if not (
+                os.path.exists(bits_file_name)
+                and os.path.samefile(self.file_name, bits_file_name)
+            ):
+                shutil.copyfile(self.file_name, bits_file_name)
+            state["file"] = os.path.abspath(bits_file_name)
+        return state
+
+    # writes file-backed bits out and closes their file; the filter can't be used
+    # after this
+    def close(self):
+        if self._file is None:
+            return
+        self.bits.flush()
+        self.bits.close()
+        self._file.close()
+        self._file = None
+
+
+# Restores a filter written with to_state into a new one, kept in file_name if given.
+# The saved bits are only read, so the map they belong to stays as it was saved.
+def bloom_from_state(state, file_name=None):
+    if "bits" in state:
+        bits = base64.b64decode(state["bits"])
+    else:
+        with open(state["file"], "rb") as bits_file:
+            bits = bits_file.read()
+    seen = BloomSeenSet(state["capacity"], state["error_rate"], file_name)
+    seen.bits[:] = bits
+    seen.count = state["count"]
+    return seen
@@ -0,0 +1,77 @@
+from time import monotonic
+import threading
+
+
+class Budget:
+    # limits of -1 mean unlimited; the reserve is the share of the request and time
+    # limits held back so post-processing can still run once the crawl stops
+    def __init__(self, max_requests=-1, deadline=-1, max_nodes=-1, reserve=0.2):
+        self.max_requests = max_requests
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.reserve = reserve
+        self.requests = 0
+        # requests are spent from prefetch threads as well as the crawl's
+        self._requests_lock = threading.Lock()
+        self.started = monotonic()
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def spend(self, requests=1):
+        with self._requests_lock:
+            self.requests += requests
+
+    def elapsed(self):
+        return monotonic() - self.started
+
+    # stops the crawl from another thread. A cancelled budget counts as used up, so
+    # post-processing only uses pages that were already fetched.
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    # blocks while the crawl is paused; time spent paused doesn't count toward the
+    # deadline
+    def wait_if_paused(self):
+        if not self._running.is_set():
+            paused_at = monotonic()
+            self._running.wait()
+            self.started += monotonic() - paused_at
+
+    # sleeps for up to seconds, waking early on a cancel or once the deadline passes.
+    # Returns whether any budget is left afterwards.
+    def sleep(self, seconds):
+        if self.deadline != -1:
+            seconds = min(seconds, self.deadline - self.elapsed())
+        if seconds > 0:
+            self._cancelled.wait(seconds)
+        return not self.exhausted()
+
+    # whether the crawl has used up its share of the budget
+    def crawl_exhausted(self, node_count=0):
+        if self.max_nodes != -1 and node_count >= self.max_nodes:
+            return True
+        return self._over(1 - self.reserve)
+
+    # whether the whole budget, reserve included, is used up
+    def exhausted(self):
+        return self._over(1)
+
+    def _over(self, share):
+        if self.cancelled():
+            return True
+        if self.max_requests != -1 and self.requests >= self.max_requests * share:
+            return True
+        if self.deadline != -1 and self.elapsed() >= self.deadline * share:
+            return True
+        return False
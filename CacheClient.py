@@ -0,0 +1,47 @@
+import requests
+
+
+# Reads pages through a shared cache daemon (see cache_daemon.py). Every failure is
+# reported as a miss, so the caller falls back to the wiki when the daemon is down.
+class CacheClient:
+    def __init__(self, address, timeout=30):
+        self.url = address if "://" in address else f"http://{address}"
+        self.timeout = timeout
+        self.available = True
+        self._session = requests.Session()
+
+    # (page id, summary, revision id), or None on a miss
+    def summary(self, title):
+        data = self._get("summary", title)
+        if data is None:
+            return None
+        return data["pageid"], data["summary"], data.get("revid", -1)
+
+    # ({title: page id}, {redirect from: to}) of every link, blacklisted or not, or
+    # None on a miss
+    def links(self, title):
+        data = self._get("links", title)
+        if data is None:
+            return None
+        return data["links"], data["redirects"]
+
+    def _get(self, kind, title):
+        if not self.available:
+            return None
+        try:
+            response = self._session.get(
+                f"{self.url}/{kind}", params={"title": title}, timeout=self.timeout
+            )
+        except requests.ConnectionError:
+            # stop trying once the daemon can't be reached
+            self.available = False
+            return None
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            # not the daemon answering, e.g. a proxy's error page
+            return None
@@ -0,0 +1,50 @@
+from time import sleep
+import threading
+import json
+import gzip
+import os
+
+
+# Wiki API responses recorded to a gzipped json file, keyed by their query, so a run
+# can be replayed exactly without the network
+class Cassette:
+    # mode is "record", "replay", or "cache" to replay what was recorded and record
+    # the rest; replayed responses can be delayed by latency seconds to mimic the
+    # real site
+    def __init__(self, file_name, mode="replay", latency=0):
+        if mode not in ("record", "replay", "cache"):
+            raise ValueError(f"unknown cassette mode {mode}")
+        self.file_name = file_name
+        self.mode = mode
+        self.latency = latency
+        self.responses = {}
+        self._lock = threading.Lock()
+        if mode == "replay" or os.path.exists(file_name):
+            with gzip.open(file_name, "rt", encoding="utf-8") as cassette_file:
+                self.responses = json.load(cassette_file)
+
+    def key(self, params):
+        return json.dumps(params, sort_keys=True)
+
+    # whether a response can be replayed for the query
+    def has(self, params):
+        return self.key(params) in self.responses
+
+    def replay(self, params):
+        key = self.key(params)
+        if key not in self.responses:
+            raise LookupError(f"no recorded response for {key}")
+        if self.latency > 0:
+            sleep(self.latency)
+        return self.responses[key]
+
+    def record(self, params, response):
+        with self._lock:
+            self.responses[self.key(params)] = response
+
+    def save(self):
+        if self.mode == "replay":
+            return
+        with self._lock:
+            with gzip.open(self.file_name, "wt", encoding="utf-8") as cassette_file:
+                json.dump(self.responses, cassette_file, separators=(",", ":"))
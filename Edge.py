@@ -1,18 +1,15 @@
-from time import sleep
-from turtle import ScrolledCanvas
-
-from numpy import true_divide
-
-
 class Edge:
     def __init__(self, src, dest, weight):
         self.src = src
         self.dest = dest
         self.weight = weight
 
+    # edges are undirected and identified by the titles of their end pages
     def __eq__(self, other):
-        return (self.src == other.src and self.dest == other.dest) or (
-            self.src == other.dest and self.dest == other.src
+        return (
+            self.src.title == other.src.title and self.dest.title == other.dest.title
+        ) or (
+            self.src.title == other.dest.title and self.dest.title == other.src.title
         )
 
     def __hash__(self):
@@ -21,17 +18,6 @@ class Edge:
     def is_cyclic(self):
         return self.src.title == self.dest.title
 
-    def either_title_startswith(self, str):
-        return self.src.title.startswith(str) or self.dest.title.startswith(str)
-
-    # see if either the source or destination node's summary is in the list of summaries
-    def either_summary_in(self, summaries, threshold):
-        sleep(0.05)
-        return (
-            self.src.summary[:threshold] in summaries
-            or self.dest.summary[:threshold] in summaries
-        )
-
     # fix edges so that they connect to graph again in case of consolidation of nodes
     def consolidate(self, other):
         other_src = other.src.title.lower().strip()
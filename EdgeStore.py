@@ -0,0 +1,80 @@
+from collections import Counter
+
+
+class EdgeStore:
+    def __init__(self, edges=()):
+        self._edges = {}
+        self._nodes = Counter()
+        for edge in edges:
+            self.add(edge)
+
+    def __iter__(self):
+        return iter(self._edges.values())
+
+    def __len__(self):
+        return len(self._edges)
+
+    def __contains__(self, edge):
+        return edge in self._edges
+
+    # number of distinct pages the stored edges touch
+    def node_count(self):
+        return len(self._nodes)
+
+    # store the edge, or add its weight onto the matching edge if it was already found
+    def add(self, edge):
+        existing = self._edges.get(edge)
+        if existing is None:
+            self._edges[edge] = edge
+            self._nodes[edge.src.title] += 1
+            self._nodes[edge.dest.title] += 1
+            return edge
+        existing.weight += edge.weight
+        return existing
+
+
+# An edge store that keeps what clean() needs up to date as edges come in, so the
+# final clean is a quick sweep: cyclic edges are never stored, every page's degree
+# is counted by weight, and pages whose titles consolidate are paired up.
+class CleaningEdgeStore(EdgeStore):
+    def __init__(self, edges=()):
+        self.degrees = Counter()
+        # (title, other title) where the first title's key is part of the second's
+        self.related_titles = set()
+        self._keys = {}
+        self._trigrams = {}
+        super().__init__(edges)
+
+    def add(self, edge):
+        if edge.is_cyclic():
+            return None
+        for title in (edge.src.title, edge.dest.title):
+            if title not in self.degrees:
+                self._relate(title)
+            self.degrees[title] += edge.weight
+        return super().add(edge)
+
+    # pairs a new title up with every stored title it consolidates with, comparing
+    # them the way Edge.consolidate does
+    def _relate(self, title):
+        key = title.lower().strip()
+        # stored keys that are part of this one
+        for start in range(len(key)):
+            for end in range(start + 1, len(key) + 1):
+                for other_title in self._keys.get(key[start:end], ()):
+                    self.related_titles.add((other_title, title))
+        # stored keys this one is part of, out of those sharing its rarest trigram
+        trigrams = [key[i : i + 3] for i in range(len(key) - 2)]
+        if len(trigrams) == 0:
+            candidates = self._keys.keys()
+        else:
+            candidates = min(
+                (self._trigrams.get(trigram, ()) for trigram in trigrams), key=len
+            )
+        for other_key in candidates:
+            if key in other_key and key != other_key:
+                for other_title in self._keys[other_key]:
+                    self.related_titles.add((title, other_title))
+        self._keys.setdefault(key, set()).add(title)
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, set()).add(key)
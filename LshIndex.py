@@ -0,0 +1,68 @@
+import random
+import zlib
+import re
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+class LshIndex:
+    # signatures are split into bands; texts sharing any band are candidates, which
+    # are then checked against the estimated Jaccard similarity of their signatures
+    def __init__(self, permutations=64, bands=16, shingle_size=3, seed=1):
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(permutations)
+        ]
+        self.bands = bands
+        self.rows = permutations // bands
+        self.shingle_size = shingle_size
+        self._buckets = {}
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    # MinHash signature of the word shingles of a text, or None if it has no words
+    def signature(self, text):
+        words = re.findall(r"\w+", text.lower())
+        if len(words) == 0:
+            return None
+        shingles = set(
+            " ".join(words[i : i + self.shingle_size])
+            for i in range(max(1, len(words) - self.shingle_size + 1))
+        )
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        return tuple(
+            min((a * value + b) % MERSENNE_PRIME for value in hashes) & MAX_HASH
+            for a, b in self.permutations
+        )
+
+    def add(self, key, signature):
+        self._signatures[key] = signature
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, []).append(key)
+
+    # keys of the indexed texts estimated to be at least threshold similar
+    def near_duplicates(self, signature, threshold):
+        candidates = set()
+        for band in self._bands(signature):
+            candidates.update(self._buckets.get(band, []))
+        return [
+            key
+            for key in candidates
+            if similarity(signature, self._signatures[key]) >= threshold
+        ]
+
+    def _bands(self, signature):
+        return [
+            (band, signature[band * self.rows : (band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+
+# Estimated Jaccard similarity of the texts behind two signatures
+def similarity(signature, other_signature):
+    matches = sum(1 for a, b in zip(signature, other_signature) if a == b)
+    return matches / len(signature)
@@ -0,0 +1,141 @@
+from collections import deque
+from map_store import load_map
+import heapq
+
+# maps up to this many pages get exact distances between every pair of pages,
+# bigger ones get distances from a few landmark pages
+ALL_PAIRS_LIMIT = 1000
+LANDMARK_COUNT = 16
+
+
+# Answers path queries over a saved map. Connections are undirected and every
+# connection counts as one hop, whatever its weight.
+class MapIndex:
+    def __init__(
+        self, state, all_pairs_limit=ALL_PAIRS_LIMIT, landmarks=LANDMARK_COUNT
+    ):
+        self.concepts = list(state["concepts"])
+        self.adjacency = {}
+        for src_title, dst_title, weight in state["edges"]:
+            if src_title == dst_title:
+                continue
+            self.adjacency.setdefault(src_title, {})[dst_title] = weight
+            self.adjacency.setdefault(dst_title, {})[src_title] = weight
+        self._lower_titles = {title.lower(): title for title in self.adjacency}
+        # exact distances double as a perfect search heuristic
+        if len(self.adjacency) <= all_pairs_limit:
+            sources = list(self.adjacency)
+        else:
+            sources = sorted(
+                self.adjacency, key=lambda title: (-len(self.adjacency[title]), title)
+            )[:landmarks]
+        self.distances = {title: self._bfs(title) for title in sources}
+        self.is_exact = len(sources) == len(self.adjacency)
+
+    # the title of a page in the map, matching case-insensitively if need be
+    def resolve(self, title):
+        if title in self.adjacency:
+            return title
+        if title.lower() in self._lower_titles:
+            return self._lower_titles[title.lower()]
+        raise KeyError(f"{title} is not in the map")
+
+    # number of hops between two pages, or None if they aren't connected
+    def distance(self, src_title, dst_title):
+        path = self.shortest_path(src_title, dst_title)
+        return None if path is None else len(path) - 1
+
+    # the titles along a shortest path between two pages, or None if there is none
+    def shortest_path(self, src_title, dst_title):
+        return self._search(self.resolve(src_title), self.resolve(dst_title))
+
+    # up to k shortest loopless paths between two pages, shortest first (Yen's algorithm)
+    def k_shortest_paths(self, src_title, dst_title, k=3):
+        src_title = self.resolve(src_title)
+        dst_title = self.resolve(dst_title)
+        first = self._search(src_title, dst_title)
+        if first is None:
+            return []
+        paths = [first]
+        candidates = []
+        tie_breaker = 0
+        while len(paths) < k:
+            previous = paths[-1]
+            for i in range(len(previous) - 1):
+                root = previous[: i + 1]
+                banned_edges = set(
+                    (path[i], path[i + 1])
+                    for path in paths
+                    if len(path) > i + 1 and path[: i + 1] == root
+                )
+                spur = self._search(root[-1], dst_title, set(root[:-1]), banned_edges)
+                if spur is not None:
+                    path = root[:-1] + spur
+                    if path not in paths and all(path != c[2] for c in candidates):
+                        tie_breaker += 1
+                        heapq.heappush(candidates, (len(path), tie_breaker, path))
+            if len(candidates) == 0:
+                break
+            paths.append(heapq.heappop(candidates)[2])
+        return paths
+
+    # the pages within radius hops of a page, as {title: hops}
+    def neighbourhood(self, title, radius=1):
+        return self._bfs(self.resolve(title), radius)
+
+    # hops from a page to every page within the limit
+    def _bfs(self, src_title, limit=-1):
+        distances = {src_title: 0}
+        queue = deque([src_title])
+        while len(queue) > 0:
+            title = queue.popleft()
+            if distances[title] == limit:
+                continue
+            for neighbour in self.adjacency[title]:
+                if neighbour not in distances:
+                    distances[neighbour] = distances[title] + 1
+                    queue.append(neighbour)
+        return distances
+
+    # a lower bound on the hops between two pages, from the triangle inequality
+    # over the indexed distances
+    def _estimate(self, title, dst_title):
+        if self.is_exact:
+            return self.distances[dst_title].get(title, 0)
+        estimate = 0
+        for distances in self.distances.values():
+            if title in distances and dst_title in distances:
+                estimate = max(estimate, abs(distances[title] - distances[dst_title]))
+        return estimate
+
+    # A* search that avoids the banned pages and (from, to) connections
+    def _search(self, src_title, dst_title, banned_titles=(), banned_edges=()):
+        if self.is_exact and dst_title not in self.distances[src_title]:
+            return None
+        parents = {src_title: None}
+        hops = {src_title: 0}
+        frontier = [(self._estimate(src_title, dst_title), 0, src_title)]
+        while len(frontier) > 0:
+            _, cur_hops, title = heapq.heappop(frontier)
+            if title == dst_title:
+                path = []
+                while title is not None:
+                    path.append(title)
+                    title = parents[title]
+                return path[::-1]
+            if cur_hops > hops[title]:
+                continue
+            for neighbour in sorted(self.adjacency[title]):
+                if neighbour in banned_titles or (title, neighbour) in banned_edges:
+                    continue
+                if neighbour not in hops or cur_hops + 1 < hops[neighbour]:
+                    hops[neighbour] = cur_hops + 1
+                    parents[neighbour] = title
+                    priority = cur_hops + 1 + self._estimate(neighbour, dst_title)
+                    heapq.heappush(frontier, (priority, cur_hops + 1, neighbour))
+        return None
+
+
+# Loads a saved map (.json) and indexes it for queries
+def load_map_index(file_name):
+    return MapIndex(load_map(file_name))
@@ -0,0 +1,310 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from time import monotonic
+import threading
+
+
+# A compact stand-in for a wiki page. Its summary and links live in the page store,
+# so holding on to a handle doesn't keep them in memory.
+class PageHandle:
+    __slots__ = ("store", "title", "pageid")
+
+    def __init__(self, store, title, pageid=None):
+        self.store = store
+        self.title = title
+        self.pageid = pageid
+
+    def __eq__(self, other):
+        return isinstance(other, PageHandle) and self.title == other.title
+
+    def __hash__(self):
+        return hash(self.title)
+
+    def __repr__(self):
+        return f"PageHandle({self.title!r})"
+
+    @property
+    def summary(self):
+        return self.store.summary(self.title)
+
+    @property
+    def links(self):
+        return self.store.links(self.title)
+
+
+class PageStore:
+    # summaries and link lists are kept in LRU caches of bounded size, so memory stays
+    # the same however many pages the crawl touches
+    # pages are identified by their canonical titles, so redirects and alternative
+    # spellings all end up as the same page
+    # an optional shared cache (a CacheClient) is asked for pages before the wiki
+    # with prefetch_workers above 0, pages can be fetched ahead of time on background
+    # threads, at most one request every prefetch_interval seconds between them.
+    # Prefetched results count toward the cache sizes, and at most half of each cache
+    # is given over to them; the oldest ones are dropped to make room for new ones.
+    def __init__(
+        self,
+        wiki,
+        summary_cache_size=2000,
+        link_cache_size=50,
+        canonical_cache_size=50000,
+        shared_cache=None,
+        prefetch_workers=0,
+        prefetch_interval=0,
+    ):
+        self.wiki = wiki
+        self.shared_cache = shared_cache
+        self.prefetch_interval = prefetch_interval
+        # called before each background fetch; prefetching stops when it returns False
+        self.can_prefetch = None
+        self._prefetcher = None
+        if prefetch_workers > 0:
+            self._prefetcher = ThreadPoolExecutor(prefetch_workers)
+        self._pending = {"summary": OrderedDict(), "links": OrderedDict()}
+        # pages found to have changed, which the shared cache may hold old copies of
+        self._stale = set()
+        self._pace_lock = threading.Lock()
+        self._last_prefetch = 0
+        self.summary_cache_size = summary_cache_size
+        self.link_cache_size = link_cache_size
+        self.canonical_cache_size = canonical_cache_size
+        self._summaries = OrderedDict()
+        self._links = OrderedDict()
+        self._canonical = OrderedDict()
+        # the revision each page was last fetched at; just a number per page, so it is
+        # kept for every page, unlike the summaries it comes with
+        self._revisions = {}
+        # summaries of the pages of a map, which are saved with it, kept outside the
+        # LRU cache so saving and refreshing a big map doesn't fetch them again
+        self._kept_titles = set()
+        self._kept_summaries = {}
+
+    def handle(self, title):
+        pageid = None
+        if title in self._canonical:
+            pageid, title = self._canonical[title]
+        elif title in self._kept_summaries:
+            pageid = self._kept_summaries[title][0]
+        elif title in self._summaries:
+            pageid = self._summaries[title][0]
+        return PageHandle(self, title, pageid)
+
+    # maps titles to their canonical titles, resolving the ones not cached yet in
+    # batches. Titles of pages that don't exist are left out.
+    def canonical_titles(self, titles):
+        unknown = [title for title in titles if title not in self._canonical]
+        if len(unknown) > 0:
+            for title, resolved in self.wiki.resolve_titles(unknown).items():
+                self._remember(self._canonical, title, resolved)
+                self._remember(self._canonical, resolved[1], resolved)
+            self._trim(self._canonical, self.canonical_cache_size)
+        return {
+            title: self._canonical[title][1]
+            for title in titles
+            if title in self._canonical
+        }
+
+    def summary(self, title):
+        if title in self._kept_summaries:
+            return self._kept_summaries[title][1]
+        if title in self._summaries:
+            self._summaries.move_to_end(title)
+        else:
+            summary = self._take_prefetched("summary", title)
+            if summary is None:
+                summary = self._fetch_summary(title)
+            self._remember_summary(title, summary)
+        return self._summaries[title][1]
+
+    # the summary of a page if it is cached, otherwise None
+    def known_summary(self, title):
+        if title in self._kept_summaries:
+            return self._kept_summaries[title][1]
+        if title not in self._summaries:
+            summary = self._take_prefetched("summary", title, wait=False)
+            if summary is None:
+                return None
+            self._remember_summary(title, summary)
+        return self._summaries[title][1]
+
+    # keeps the summaries of these pages, once known, until the store is done with
+    # them, however many pages the LRU cache has room for
+    def keep_summaries(self, titles):
+        for title in titles:
+            self._kept_titles.add(title)
+            if title in self._summaries:
+                self._kept_summaries[title] = self._summaries[title]
+
+    # the id of the revision a page's summary was fetched at, otherwise None
+    def known_revision(self, title):
+        return self._revisions.get(title)
+
+    # records the revision a page is known at, e.g. from a saved map
+    def set_revision(self, title, revid):
+        if revid != -1:
+            self._revisions[title] = revid
+
+    # caches a summary that is already known, e.g. from a saved map
+    def set_summary(self, title, summary, pageid=-1, revid=-1):
+        self._remember_summary(title, (pageid, summary, revid))
+
+    def _remember_summary(self, title, summary):
+        self.set_revision(title, summary[2])
+        if title in self._kept_titles:
+            self._kept_summaries[title] = summary
+        self._remember(self._summaries, title, summary)
+        self._trim(self._summaries, self._cache_size("summary"))
+
+    # finds which pages changed since their known revisions, with one cheap revision
+    # query per MAX_TITLES_PER_QUERY pages. Changed pages lose their cached summary,
+    # links and revision so all are fetched again. Returns the changed titles.
+    def revalidate(self, titles):
+        revisions = self.wiki.fetch_revisions(titles)
+        changed = set()
+        for title in titles:
+            if revisions.get(title, -1) == self.known_revision(title):
+                continue
+            changed.add(title)
+            self._summaries.pop(title, None)
+            self._kept_summaries.pop(title, None)
+            self._links.pop(title, None)
+            self._revisions.pop(title, None)
+        self._stale.update(changed)
+        return changed
+
+    def links(self, title):
+        if title in self._links:
+            self._links.move_to_end(title)
+        else:
+            fetched = self._take_prefetched("links", title)
+            if fetched is None:
+                fetched = self._fetch_links(title)
+            links, redirects = fetched
+            for redirect_title, target_title in redirects.items():
+                if target_title in links:
+                    resolved = (links[target_title], target_title)
+                    self._remember(self._canonical, redirect_title, resolved)
+            self._trim(self._canonical, self.canonical_cache_size)
+            self._remember(self._links, title, links)
+            self._trim(self._links, self._cache_size("links"))
+        return {
+            link_title: PageHandle(self, link_title, pageid)
+            for link_title, pageid in self._links[title].items()
+        }
+
+    # starts fetching a page's links and/or summary in the background, so they are
+    # ready by the time the crawl gets to the page. The results are only cached once
+    # the crawl asks for them, so the caches are never touched by two threads.
+    def prefetch(self, title, links=True, summary=True):
+        if self._prefetcher is None:
+            return
+        kinds = []
+        if links and title not in self._links:
+            kinds.append(("links", self._fetch_links, self._links))
+        if summary and title not in self._summaries:
+            kinds.append(("summary", self._fetch_summary, self._summaries))
+        for kind, fetch, cache in kinds:
+            pending = self._pending[kind]
+            if title in pending:
+                continue
+            # prefetches that were never taken, e.g. of pruned pages, are the oldest
+            while len(pending) >= self._prefetch_limit(kind):
+                self._cancel_prefetch(*pending.popitem(last=False)[1])
+            cancelled = threading.Event()
+            future = self._prefetcher.submit(self._prefetch, fetch, title, cancelled)
+            pending[title] = (future, cancelled)
+            self._trim(cache, self._cache_size(kind))
+
+    def _prefetch(self, fetch, title, cancelled):
+        if self.can_prefetch is not None and not self.can_prefetch():
+            return None
+        # pace the background fetches so they stay within the rate limit, waiting in
+        # a way that taking or dropping the prefetch can cut short
+        with self._pace_lock:
+            start = max(monotonic(), self._last_prefetch + self.prefetch_interval)
+            self._last_prefetch = start
+        if cancelled.wait(max(0, start - monotonic())):
+            return None
+        return fetch(title)
+
+    # the result of a background fetch, or None if there was none or it failed
+    def _take_prefetched(self, kind, title, wait=True):
+        pending = self._pending[kind]
+        if title not in pending:
+            return None
+        future, cancelled = pending[title]
+        if not wait and not future.done():
+            return None
+        del pending[title]
+        # a fetch still waiting its turn is quicker done right away, so only one
+        # that is already under way is waited for
+        self._cancel_prefetch(future, cancelled)
+        if future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def _cancel_prefetch(self, future, cancelled):
+        cancelled.set()
+        future.cancel()
+
+    # how many prefetched results of a kind may be held at once
+    def _prefetch_limit(self, kind):
+        if kind == "summary":
+            return max(1, self.summary_cache_size // 2)
+        return max(1, self.link_cache_size // 2)
+
+    # the size a cache is trimmed to, leaving room for the results being prefetched
+    def _cache_size(self, kind):
+        if kind == "summary":
+            size = self.summary_cache_size
+        else:
+            size = self.link_cache_size
+        return max(1, size - len(self._pending[kind]))
+
+    # stops prefetching and drops whatever was prefetched; the store still works
+    # without it
+    def close(self):
+        if self._prefetcher is None:
+            return
+        for pending in self._pending.values():
+            for future, cancelled in pending.values():
+                self._cancel_prefetch(future, cancelled)
+            pending.clear()
+        self._prefetcher.shutdown(wait=False)
+        self._prefetcher = None
+
+    # drops a page's link list once it has been expanded
+    def evict_links(self, title):
+        self._links.pop(title, None)
+
+    def _fetch_summary(self, title):
+        if self.shared_cache is not None and title not in self._stale:
+            summary = self.shared_cache.summary(title)
+            if summary is not None:
+                return summary
+        return self.wiki.fetch_summary(title)
+
+    def _fetch_links(self, title):
+        if self.shared_cache is not None and title not in self._stale:
+            shared = self.shared_cache.links(title)
+            if shared is not None:
+                links, redirects = shared
+                # the shared cache holds every link, so apply this run's blacklist
+                links = {
+                    link_title: pageid
+                    for link_title, pageid in links.items()
+                    if not self.wiki.is_blacklisted(link_title)
+                }
+                return links, redirects
+        return self.wiki.fetch_links(title)
+
+    def _remember(self, cache, title, value):
+        cache[title] = value
+        cache.move_to_end(title)
+
+    def _trim(self, cache, size):
+        while len(cache) > size:
+            cache.popitem(last=False)
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote
+import wikipediaapi
+
+# the API accepts at most this many titles in one query
+MAX_TITLES_PER_QUERY = 50
+
+
+# Splits a list of titles into chunks small enough for one query
+def batched(titles, size=MAX_TITLES_PER_QUERY):
+    return [titles[i : i + size] for i in range(0, len(titles), size)]
+
+
+class WikiClient(wikipediaapi.Wikipedia):
+    # one client is shared by the whole process so every request reuses the same
+    # pooled keep-alive connections
+    def __init__(
+        self,
+        language="en",
+        summary_chars=1000,
+        blacklist_titles=(),
+        blacklist_title_starters=(),
+        pool_size=10,
+        **kwargs,
+    ):
+        super().__init__(language, **kwargs)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self.pool_size = pool_size
+        self._session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        )
+        self.summary_chars = summary_chars
+        self.blacklist_titles = set(blacklist_titles)
+        self.blacklist_title_starters = tuple(blacklist_title_starters)
+        self.request_count = 0
+        self.on_request = None
+        # a Cassette to record responses to or replay them from
+        self.cassette = None
+
+    # trim every query down to the fields the map actually uses
+    def _query(self, page, params):
+        props = params.get("prop", "").split("|")
+        if "extracts" in props:
+            params["exintro"] = 1
+            params["exchars"] = self.summary_chars
+        if "links" in props:
+            params["plnamespace"] = 0
+        self.request_count += 1
+        if self.on_request is not None:
+            self.on_request()
+        if self.cassette is None:
+            return super()._query(page, params)
+        if self.cassette.mode == "replay" or (
+            self.cassette.mode == "cache" and self.cassette.has(params)
+        ):
+            return self.cassette.replay(params)
+        # keyed before the base class adds its own params
+        recorded_params = dict(params)
+        response = super()._query(page, params)
+        self.cassette.record(recorded_params, response)
+        return response
+
+    # whether a linked page should never be fetched or expanded
+    def is_blacklisted(self, title):
+        return title in self.blacklist_titles or title.startswith(
+            self.blacklist_title_starters
+        )
+
+    # fetches the articles a page links to as a dict of title -> page id, plus the
+    # redirects that were followed to get to them. Links to redirects come back as the
+    # pages they point at, and blacklisted pages are left out before anything samples
+    # or expands them.
+    def fetch_links(self, title):
+        params = {
+            "action": "query",
+            "generator": "links",
+            "titles": title,
+            # only link to articles, never categories, templates, portals...
+            "gplnamespace": 0,
+            "gpllimit": "max",
+        }
+        links = {}
+        redirects = {}
+        while True:
+            # _query only uses the page for its language
+            raw = self._query(self.page(title), params)
+            query = raw.get("query", {})
+            for redirect in query.get("redirects", []):
+                redirects[redirect["from"]] = redirect["to"]
+            for page in query.get("pages", {}).values():
+                if "missing" not in page and not self.is_blacklisted(page["title"]):
+                    links[page["title"]] = page["pageid"]
+            if "continue" not in raw:
+                return links, redirects
+            params.update(raw["continue"])
+
+    # resolves titles to (page id, canonical title), following normalization and
+    # redirects, MAX_TITLES_PER_QUERY titles a request. Titles of pages that don't
+    # exist are left out.
+    def resolve_titles(self, titles):
+        resolved = {}
+        for batch in batched(list(titles)):
+            params = {"action": "query", "titles": "|".join(batch)}
+            query = self._query(self.page(batch[0]), params).get("query", {})
+            renamed = {}
+            for rename in query.get("normalized", []) + query.get("redirects", []):
+                renamed[rename["from"]] = rename["to"]
+            pages = {
+                page["title"]: page["pageid"]
+                for page in query.get("pages", {}).values()
+                if "missing" not in page and "invalid" not in page
+            }
+            for title in batch:
+                canonical = title
+                # normalized, then redirected
+                for _ in range(2):
+                    canonical = renamed.get(canonical, canonical)
+                if canonical in pages:
+                    resolved[title] = (pages[canonical], canonical)
+        return resolved
+
+    # the title of the article the wiki's search ranks first for a query, or None if
+    # nothing matches
+    def search_title(self, query):
+        params = {
+            "action": "query",
+            "list": "search",
+            "srsearch": query,
+            "srnamespace": 0,
+            "srlimit": 1,
+            "srprop": "",
+        }
+        raw = self._query(self.page(query), params)
+        for result in raw.get("query", {}).get("search", []):
+            return result["title"]
+        return None
+
+    # searches for many queries at once over the pooled connections, as a dict of
+    # query -> title for the queries that matched something
+    def search_titles(self, queries):
+        with ThreadPoolExecutor(self.pool_size) as pool:
+            titles = dict(zip(queries, pool.map(self.search_title, queries)))
+        return {query: title for query, title in titles.items() if title is not None}
+
+    # the url of the article with the given title
+    def page_url(self, title):
+        return f"https://{self.language}.wikipedia.org/wiki/{quote(title.replace(' ', '_'))}"
+
+    # fetches a page's id, the plain text of its intro and the id of the revision
+    # the text is from
+    def fetch_summary(self, title):
+        params = {
+            "action": "query",
+            "prop": "extracts|info",
+            "titles": title,
+            "explaintext": 1,
+            "exsectionformat": "wiki",
+        }
+        raw = self._query(self.page(title), params)
+        for page in raw["query"]["pages"].values():
+            return (
+                page.get("pageid", -1),
+                page.get("extract", "").strip(),
+                page.get("lastrevid", -1),
+            )
+        return -1, "", -1
+
+    # fetches the id of the latest revision of each page, MAX_TITLES_PER_QUERY titles
+    # a request. Pages that don't exist or are now redirects are left out.
+    def fetch_revisions(self, titles):
+        revisions = {}
+        for batch in batched(list(titles)):
+            params = {"action": "query", "prop": "info", "titles": "|".join(batch)}
+            query = self._query(self.page(batch[0]), params).get("query", {})
+            for page in query.get("pages", {}).values():
+                if "missing" not in page and "invalid" not in page:
+                    revisions[page["title"]] = page["lastrevid"]
+        return revisions
+
+    # finds which of the source pages link to which of the target pages, for up to
+    # MAX_TITLES_PER_QUERY titles of each, as (source title, target title) pairs
+    def links_between(self, source_titles, target_titles):
+        params = {
+            "action": "query",
+            "prop": "links",
+            "titles": "|".join(source_titles),
+            "pltitles": "|".join(target_titles),
+            "pllimit": "max",
+        }
+        found = []
+        while True:
+            # _query only uses the page for its language
+            raw = self._query(self.page(source_titles[0]), params)
+            for page in raw["query"]["pages"].values():
+                for link in page.get("links", []):
+                    found.append((page["title"], link["title"]))
+            if "continue" not in raw:
+                return found
+            params.update(raw["continue"])
@@ -0,0 +1,269 @@
+from contextlib import redirect_stdout, redirect_stderr
+from itertools import product
+from colorama import Style
+from colorama import Fore
+from Cassette import Cassette
+from Budget import Budget
+import influence_map_tui as crawler
+import tracemalloc
+import argparse
+import random
+import time
+import csv
+import sys
+import io
+
+# the crawl constants that are tuned, with the values tried by default
+PARAMETERS = {
+    "SEARCH_INTENSITY": [3, 5, 8],
+    "DEFAULT_DEPTH_LIMIT": [2, 3],
+    "DEFAULT_WIDTH_LIMIT": [2, 3, 4],
+    "MIN_CONNECTIONS_MULTIPLIER": [1, 2, 3],
+    "SUMMARY_THRESHOLD": [20],
+}
+# the crawler's own delay, kept for runs that may fetch from the live site
+SLEEPER_DELAY = crawler.SLEEPER_DELAY
+
+
+# Runs a whole crawl with one configuration against the cassette and measures it.
+# The crawl is run twice, once timed and once with its memory traced, as tracing
+# slows it down.
+def run_configuration(concept_list, config, cassette, seed):
+    try:
+        started = time.perf_counter()
+        wiki, wiki_set, connections = crawl(concept_list, config, cassette, seed)
+        wall_time = time.perf_counter() - started
+        requests = wiki.request_count
+        tracemalloc.start()
+        try:
+            crawl(concept_list, config, cassette, seed)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        error = ""
+    except LookupError as lookup_error:
+        # the cassette is missing some response the configuration needs
+        wiki_set = set()
+        connections = []
+        requests = 0
+        wall_time = 0
+        peak_memory = 0
+        error = str(lookup_error)[:60]
+    titles = set()
+    for connection in connections:
+        titles.add(connection.src.title)
+        titles.add(connection.dest.title)
+    return {
+        **config,
+        "requests": requests,
+        "wall_time": round(wall_time, 2),
+        "peak_memory_mb": round(peak_memory / 2**20, 1),
+        "nodes": len(titles),
+        "edges": len(connections),
+        "connectivity": round(
+            concept_connectivity([page.title for page in wiki_set], connections), 3
+        ),
+        "error": error,
+    }
+
+
+# One crawl with a configuration, from a fresh client and store, returning the client,
+# the concepts' pages and the connections
+def crawl(concept_list, config, cassette, seed):
+    for name, value in config.items():
+        setattr(crawler, name, value)
+    # a fresh client and store per run, so no run reuses another's cached pages
+    crawler.wiki_client = None
+    crawler.page_store = None
+    # replayed responses need no pacing, but missing ones are fetched from the live
+    # site and must be spaced out like in any other crawl
+    crawler.SLEEPER_DELAY = 0 if cassette.mode == "replay" else SLEEPER_DELAY
+    crawler.PREFETCH_WORKERS = 0
+    crawler.CACHE_SERVER = ""
+    crawler.CASSETTE_FILE = ""
+    random.seed(seed)
+    wiki = crawler.get_wiki()
+    wiki.cassette = cassette
+    budget = Budget()
+    wiki.on_request = budget.spend
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        wiki_set = crawler.wikify_concepts(concept_list)
+        connections = list(crawler.connect_concepts(wiki_set, budget, set(), set()))
+    return wiki, wiki_set, connections
+
+
+# Share of concept pairs joined by some path in the map
+def concept_connectivity(concepts, connections):
+    if len(concepts) < 2:
+        return 0
+    parents = {}
+
+    def find(title):
+        parents.setdefault(title, title)
+        while parents[title] != title:
+            parents[title] = parents[parents[title]]
+            title = parents[title]
+        return title
+
+    for connection in connections:
+        parents[find(connection.src.title)] = find(connection.dest.title)
+    pairs = [
+        (concept, other)
+        for i, concept in enumerate(concepts)
+        for other in concepts[i + 1 :]
+    ]
+    joined = [pair for pair in pairs if find(pair[0]) == find(pair[1])]
+    return len(joined) / len(pairs)
+
+
+# Configurations no other configuration beats on both cost and quality
+def pareto_frontier(results):
+    complete = [result for result in results if result["error"] == ""]
+    frontier = []
+    for result in complete:
+        dominated = any(
+            other["requests"] <= result["requests"]
+            and quality(other) >= quality(result)
+            and (other["requests"], quality(other))
+            != (result["requests"], quality(result))
+            for other in complete
+        )
+        if not dominated:
+            frontier.append(result)
+    return sorted(frontier, key=lambda result: result["requests"])
+
+
+# Connectivity first, then the size of the map
+def quality(result):
+    return (result["connectivity"], result["edges"])
+
+
+# The best configuration on the frontier within the request budget
+def recommend(frontier, max_requests=-1):
+    affordable = [
+        result
+        for result in frontier
+        if max_requests == -1 or result["requests"] <= max_requests
+    ]
+    if len(affordable) == 0:
+        return None
+    return max(affordable, key=lambda result: (quality(result), -result["requests"]))
+
+
+# Parses the command-line args
+def handle_args(args):
+    parser = argparse.ArgumentParser(
+        description="Replays crawls over a grid of search parameters and reports "
+        "the cost and quality of the map each one makes. A crawl only replays "
+        "pages the cassette has, so configurations searching wider, deeper or "
+        "with a different intensity than the recorded crawl fail on cassette "
+        "misses; record the widest configuration of the grid first, or use "
+        "--record-missing."
+    )
+    parser.add_argument(
+        "file", help="file containing the names of the concepts to investigate"
+    )
+    parser.add_argument(
+        "cassette",
+        help="cassette (see influence_map_tui.py --record) the crawls are replayed from",
+    )
+    parser.add_argument(
+        "--record-missing",
+        action="store_true",
+        help="fetch responses the cassette doesn't have from Wikipedia and record "
+        "them, instead of failing the configurations that need them. These runs "
+        "wait the usual delay between requests.",
+    )
+    for name, values in PARAMETERS.items():
+        parser.add_argument(
+            "--" + name.lower().replace("_", "-"),
+            default=",".join(str(value) for value in values),
+            help=f"comma-separated values of {name} to try",
+        )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=-1,
+        help="try this many random configurations of the grid instead of all of them",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=-1,
+        help="recommend the best configuration within this many requests",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed for every crawl")
+    parser.add_argument("--csv", help="also write the results to this csv file")
+    return parser.parse_args(args)
+
+
+def main(args):
+    options = handle_args(args)
+    concept_list = [
+        concept.strip()
+        for concept in crawler.handle_file(options.file, "\n")
+        if concept.strip() != ""
+    ]
+    grid = {
+        name: [int(value) for value in getattr(options, name.lower()).split(",")]
+        for name in PARAMETERS
+    }
+    configs = [dict(zip(grid, values)) for values in product(*grid.values())]
+    if options.samples != -1 and options.samples < len(configs):
+        configs = random.Random(options.seed).sample(configs, options.samples)
+    cassette = Cassette(
+        options.cassette, "cache" if options.record_missing else "replay"
+    )
+
+    results = []
+    for i, config in enumerate(configs):
+        print(
+            f"Running configuration {Fore.LIGHTWHITE_EX}{i + 1}/{len(configs)}{Style.RESET_ALL} {config}..."
+        )
+        results.append(run_configuration(concept_list, config, cassette, options.seed))
+        if results[-1]["error"] != "":
+            print(
+                f"  {Fore.MAGENTA}Not in the cassette: {results[-1]['error']}{Style.RESET_ALL}"
+            )
+            continue
+        print(
+            f"  {results[-1]['requests']} requests, {results[-1]['nodes']} nodes, "
+            f"{results[-1]['edges']} edges, connectivity {results[-1]['connectivity']}"
+        )
+    cassette.save()
+    failures = sum(1 for result in results if result["error"] != "")
+    if failures > 0:
+        print(
+            f"{Fore.MAGENTA}{failures} configurations needed pages the cassette doesn't have. "
+            f"Record a crawl at least as wide and deep as the grid, or run with --record-missing.{Style.RESET_ALL}"
+        )
+    if len(results) == 0:
+        print(f"{Fore.MAGENTA}No configurations to run.{Style.RESET_ALL}")
+        return
+
+    if options.csv is not None:
+        with open(options.csv, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+
+    frontier = pareto_frontier(results)
+    print(f"{Fore.LIGHTGREEN_EX}Cost/quality frontier:{Style.RESET_ALL}")
+    for result in frontier:
+        print(f"  {result}")
+    best = recommend(frontier, options.max_requests)
+    if len(frontier) == 0:
+        print(
+            f"{Fore.MAGENTA}No configuration could be replayed from the cassette.{Style.RESET_ALL}"
+        )
+    elif best is None:
+        print(
+            f"{Fore.MAGENTA}No configuration fits in the request budget.{Style.RESET_ALL}"
+        )
+    else:
+        settings = ", ".join(f"{name} = {best[name]}" for name in PARAMETERS)
+        print(f"{Fore.LIGHTCYAN_EX}Recommended:{Style.RESET_ALL} {settings}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,131 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from WikiClient import WikiClient
+import threading
+import argparse
+import json
+import sys
+import os
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+SUMMARY_CHAR_LIMIT = 1000
+
+
+# Pages fetched from the wiki on behalf of every client. Concurrent misses for the
+# same page wait on one upstream fetch instead of each making their own.
+class PageCache:
+    def __init__(self, wiki):
+        self.wiki = wiki
+        self.entries = {"summary": {}, "links": {}}
+        self.fetchers = {"summary": self._fetch_summary, "links": self._fetch_links}
+        self.upstream_count = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def get(self, kind, title):
+        with self._lock:
+            if title in self.entries[kind]:
+                return self.entries[kind][title]
+            pending = self._in_flight.get((kind, title))
+            is_owner = pending is None
+            if is_owner:
+                pending = {"done": threading.Event(), "value": None}
+                self._in_flight[(kind, title)] = pending
+        if is_owner:
+            try:
+                pending["value"] = self.fetchers[kind](title)
+            finally:
+                with self._lock:
+                    if pending["value"] is not None:
+                        self.entries[kind][title] = pending["value"]
+                    del self._in_flight[(kind, title)]
+                pending["done"].set()
+        else:
+            pending["done"].wait()
+        if pending["value"] is None:
+            raise LookupError(f"could not fetch {kind} of {title}")
+        return pending["value"]
+
+    def _fetch_summary(self, title):
+        self.upstream_count += 1
+        pageid, summary, revid = self.wiki.fetch_summary(title)
+        return {"pageid": pageid, "summary": summary, "revid": revid}
+
+    def _fetch_links(self, title):
+        self.upstream_count += 1
+        links, redirects = self.wiki.fetch_links(title)
+        return {"links": links, "redirects": redirects}
+
+    def load(self, file_name):
+        with open(file_name, "r", encoding="utf-8") as cache_file:
+            self.entries.update(json.load(cache_file))
+
+    def save(self, file_name):
+        with self._lock:
+            with open(file_name, "w", encoding="utf-8") as cache_file:
+                json.dump(self.entries, cache_file)
+
+
+# Answers GET /summary?title=... and GET /links?title=... with json
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        kind = url.path.strip("/")
+        titles = parse_qs(url.query).get("title", [])
+        if kind not in self.server.cache.entries or len(titles) != 1:
+            self.send_error(404)
+            return
+        try:
+            body = json.dumps(self.server.cache.get(kind, titles[0])).encode("utf-8")
+        except Exception as error:
+            self.send_error(502, str(error))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Serves the cache until interrupted, saving it to the cache file if there is one
+def serve(host, port, cache_file=None):
+    # links aren't blacklisted here since every client has its own blacklist
+    cache = PageCache(WikiClient("en", SUMMARY_CHAR_LIMIT))
+    if cache_file is not None and os.path.exists(cache_file):
+        cache.load(cache_file)
+    server = ThreadingHTTPServer((host, port), CacheRequestHandler)
+    server.cache = cache
+    print(f"Serving the page cache on {host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if cache_file is not None:
+            cache.save(cache_file)
+        print(f"Fetched {cache.upstream_count} page(s) from the wiki")
+
+
+# Parses the command-line args
+def handle_args(args):
+    parser = argparse.ArgumentParser(
+        description="Shares fetched Wikipedia pages between influence map runs."
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="port to listen on"
+    )
+    parser.add_argument(
+        "--cache-file", help="json file the cache is loaded from and saved to"
+    )
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = handle_args(sys.argv[1:])
+    serve(args.host, args.port, args.cache_file)
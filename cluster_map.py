@@ -0,0 +1,141 @@
+from collections import Counter
+import random
+from map_html import add_scripts, script_json
+
+CLUSTER_COLOR = "#f2c57e"
+
+# Expands a super-node into its members when it is double-clicked. Members keep
+# edges to pages still hidden in other clusters by pointing them at those clusters.
+CLUSTER_SCRIPT = """
+var clusters = JSON.parse(document.getElementById("cluster-data").textContent);
+var clusterOf = {};
+for (var clusterId in clusters) {
+    clusters[clusterId].nodes.forEach(function (node) {
+        clusterOf[node.id] = clusterId;
+    });
+}
+function visibleId(title) {
+    return nodes.get(title) !== null ? title : clusterOf[title];
+}
+network.on("doubleClick", function (params) {
+    if (params.nodes.length !== 1 || !(params.nodes[0] in clusters)) {
+        return;
+    }
+    var cluster = clusters[params.nodes[0]];
+    edges.remove(network.getConnectedEdges(params.nodes[0]));
+    nodes.remove(params.nodes[0]);
+    nodes.add(cluster.nodes);
+    var added = {};
+    cluster.edges.forEach(function (edge) {
+        var from = visibleId(edge.from);
+        var to = visibleId(edge.to);
+        var key = from < to ? from + "|" + to : to + "|" + from;
+        if (from === to || key in added) {
+            return;
+        }
+        added[key] = true;
+        edges.add({ from: from, to: to, value: edge.value, title: edge.title });
+    });
+});
+"""
+
+
+# Groups pages into communities by label propagation over the weighted edges
+def label_propagation(connections, iterations=20, seed=1):
+    neighbours = {}
+    for connection in connections:
+        src_title = connection.src.title
+        dst_title = connection.dest.title
+        for title, other_title in ((src_title, dst_title), (dst_title, src_title)):
+            weights = neighbours.setdefault(title, Counter())
+            weights[other_title] += connection.weight
+    labels = {title: title for title in neighbours}
+    titles = sorted(neighbours)
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        rng.shuffle(titles)
+        changed = False
+        for title in titles:
+            scores = Counter()
+            for neighbour, weight in neighbours[title].items():
+                scores[labels[neighbour]] += weight
+            # ties keep the current label, then go to the smallest label
+            best = max(
+                sorted(scores),
+                key=lambda label: (scores[label], label == labels[title]),
+            )
+            if best != labels[title]:
+                labels[title] = best
+                changed = True
+        if not changed:
+            break
+    return labels
+
+
+# Adds the map to the network with each community collapsed into one super-node, and
+# returns the members and edges of each super-node for the browser to load when the
+# super-node is expanded
+def add_clustered_map(net, connections, node_attributes):
+    labels = label_propagation(connections)
+    degrees = Counter()
+    for connection in connections:
+        degrees[connection.src.title] += connection.weight
+        degrees[connection.dest.title] += connection.weight
+    members = {}
+    for title, label in labels.items():
+        members.setdefault(label, []).append(title)
+
+    cluster_ids = {}
+    clusters = {}
+    for titles in members.values():
+        titles.sort(key=lambda title: (-degrees[title], title))
+        if len(titles) == 1:
+            net.add_node(titles[0], **node_attributes[titles[0]])
+            continue
+        cluster_id = "cluster:" + titles[0]
+        for title in titles:
+            cluster_ids[title] = cluster_id
+        net.add_node(
+            cluster_id,
+            label=f"{titles[0]} (+{len(titles) - 1})",
+            color=CLUSTER_COLOR,
+            value=len(titles),
+            title="\n".join(titles[:10] + (["..."] if len(titles) > 10 else [])),
+        )
+        clusters[cluster_id] = {
+            "nodes": [
+                dict(id=title, label=title, **node_attributes[title])
+                for title in titles
+            ],
+            "edges": [],
+        }
+
+    cluster_edges = Counter()
+    for connection in connections:
+        src_title = connection.src.title
+        dst_title = connection.dest.title
+        edge = {
+            "from": src_title,
+            "to": dst_title,
+            "value": connection.weight,
+            "title": f"Found {connection.weight} time(s)",
+        }
+        src_id = cluster_ids.get(src_title, src_title)
+        dst_id = cluster_ids.get(dst_title, dst_title)
+        for cluster_id in set([src_id, dst_id]) & clusters.keys():
+            clusters[cluster_id]["edges"].append(edge)
+        if src_id != dst_id:
+            cluster_edges[tuple(sorted((src_id, dst_id)))] += connection.weight
+    for (src_id, dst_id), weight in cluster_edges.items():
+        net.add_edge(src_id, dst_id, value=weight, title=f"{weight} connection(s)")
+    return clusters
+
+
+# Adds the super-node members and the script that expands them to a written map
+def add_cluster_script(file_name, clusters):
+    add_scripts(
+        file_name,
+        '<script type="application/json" id="cluster-data">'
+        f"{script_json(clusters)}</script>\n"
+        f"<script>{CLUSTER_SCRIPT}</script>\n",
+    )
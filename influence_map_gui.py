@@ -1,14 +1,27 @@
-from itertools import combinations
+from collections import Counter
+from itertools import combinations, count
 import threading
 from pyvis.network import Network
 from json import JSONDecodeError
 from colorama import Style
 from colorama import Fore
 from time import sleep
+from page_rank import personalized_page_rank
+from EdgeStore import EdgeStore, CleaningEdgeStore
+from WikiClient import WikiClient, batched
+from PageStore import PageStore
+from CacheClient import CacheClient
+from LshIndex import LshIndex
+from map_store import save_map, load_map
+from cluster_map import add_clustered_map, add_cluster_script
+from map_html import add_summary_script
+from Budget import Budget
+from Cassette import Cassette
+from BloomSeenSet import BloomSeenSet
 from Edge import Edge
-import wikipediaapi
 import textwrap
 import random
+import heapq
 import nltk
 import math
 import sys
@@ -17,13 +30,30 @@ import re
 nltk.download("stopwords")
 
 window = None
+wiki_client = None
+page_store = None
+# the settings the shared client and store were made with
+wiki_client_settings = None
+page_store_settings = None
+crawl_budget = None
 global_text_output = ""
 
 import PySimpleGUI as gui
 
 STOP_WORD_SET = set(nltk.corpus.stopwords.words("english"))
 ALLOW_DIRECT_LINK_BYPASS = False
+BEST_FIRST_SEARCH = False
+FETCH_BUDGET = -1
+PAGE_RANK_INTERVAL = 10
+PAGE_RANK_DAMPING = 0.85
 SHOULD_CONSOLIDATE_TITLES = True
+SHOULD_MERGE_NEAR_DUPLICATES = True
+NEAR_DUPLICATE_THRESHOLD = 0.8
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHOULD_CLUSTER_LARGE_MAPS = True
+CLUSTER_NODE_THRESHOLD = 300
+SHOULD_LAZY_LOAD_SUMMARIES = True
 SEARCH_INTENSITY = 5
 SLEEPER_DELAY = 1.5
 DEFAULT_DEPTH_LIMIT = 3
@@ -31,6 +61,24 @@ DEFAULT_WIDTH_LIMIT = 3
 MIN_CONNECTIONS_OVERRIDE = -1
 MIN_CONNECTIONS_MULTIPLIER = 2
 SUMMARY_THRESHOLD = 20
+SUMMARY_CHAR_LIMIT = 1000
+SUMMARY_CACHE_SIZE = 2000
+LINK_CACHE_SIZE = 50
+CACHE_SERVER = ""
+PREFETCH_WORKERS = 2
+PREFETCH_INTERVAL = 0.5
+SEEN_SET = "set"
+SEEN_SET_CAPACITY = 1000000
+SEEN_SET_ERROR_RATE = 0.01
+SEEN_SET_FILE = ""
+RANDOM_SEED = -1
+CASSETTE_FILE = ""
+CASSETTE_MODE = "replay"
+REPLAY_LATENCY = 0
+MAX_REQUESTS = -1
+DEADLINE = -1
+MAX_NODES = -1
+RESERVED_BUDGET_FRACTION = 0.2
 BLACKLIST_TITLES = [
     "Wayback Machine",
     "Digital object identifier",
@@ -55,42 +103,86 @@ BLACKLIST_TITLE_STARTERS = [
 ]
 
 
-# runs all the top-level functions
-def main(wndw, concept_list):
+# runs all the top-level functions, always telling the window when it is done
+def main(wndw, concept_list, budget, extend_file="", refresh=False):
     global window
     window = wndw
-    wiki_set = wikify_concepts(concept_list)
-    connections_list = connect_concepts(wiki_set, wndw)
-    graph_connections(connections_list, wiki_set)
-    window.write_event_value("-FINISHED-", 0)
+    error = ""
+    try:
+        map_concepts(wndw, concept_list, budget, extend_file, refresh)
+    except Exception as search_error:
+        error = f"{type(search_error).__name__}: {search_error}"
+        text_output(f"{Fore.RED}The search failed ({error}).{Style.RESET_ALL}")
+        raise
+    finally:
+        window.write_event_value("-FINISHED-", error)
+
+
+# searches for the concepts' map, or extends a saved one, then draws and saves it
+def map_concepts(wndw, concept_list, budget, extend_file, refresh):
+    if RANDOM_SEED != -1:
+        random.seed(RANDOM_SEED)
+    get_wiki().on_request = budget.spend
+    get_page_store().can_prefetch = lambda: not budget.crawl_exhausted()
+    wiki_set = wikify_concepts(concept_list, report=True)
+    if extend_file == "":
+        seen_pages = make_seen_set()
+        searched_pairs = set()
+        connections_list = connect_concepts(
+            wiki_set, wndw, budget, seen_pages, searched_pairs
+        )
+    else:
+        connections_list, seen_pages, searched_pairs = extend_map(
+            load_map(extend_file, SEEN_SET_FILE if SEEN_SET_FILE != "" else None),
+            wiki_set,
+            wndw,
+            budget,
+            refresh,
+        )
+    graph_connections(connections_list, wiki_set, budget)
+    save_map_state(connections_list, wiki_set, seen_pages, searched_pairs)
+    if isinstance(seen_pages, BloomSeenSet):
+        seen_pages.close()
+    if get_wiki().cassette is not None:
+        get_wiki().cassette.save()
 
 
 # clean up the connections and reduce the number for clarity and effectiveness
-def clean(connections_list, min_connections=2):
+def clean(connections_list, budget, min_connections=2):
     connections = list(connections_list)
 
     text_output(
         f"Cleaning connections list {Fore.RED}({len(connections)}){Style.RESET_ALL}..."
     )
 
-    # remove articles that don't have content
-    connections = remove_blacklisted_title_starters(
-        connections, BLACKLIST_TITLE_STARTERS
-    )
+    # edges gathered in a CleaningEdgeStore had cycles dropped and degrees and
+    # consolidation pairs worked out as they arrived
+    is_presorted = isinstance(connections_list, CleaningEdgeStore)
 
     # remove cycles
-    connections = remove_cycles(connections)
+    if not is_presorted:
+        connections = remove_cycles(connections)
 
     # reduce dead-end connections
     connections = remove_dead_ends(
-        connections, min_connections * MIN_CONNECTIONS_MULTIPLIER
+        connections,
+        min_connections * MIN_CONNECTIONS_MULTIPLIER,
+        connections_list.degrees if is_presorted else None,
     )
 
     # excluded titles
-    connections = exclude_blacklisted_pages(connections, BLACKLIST_TITLES)
+    connections = exclude_blacklisted_pages(connections, BLACKLIST_TITLES, budget)
+
+    # stubs and boilerplate pages that say the same thing become one node
+    if SHOULD_MERGE_NEAR_DUPLICATES:
+        connections = merge_near_duplicates(connections, budget)
 
     # way too good at its job
-    if SHOULD_CONSOLIDATE_TITLES:
+    if SHOULD_CONSOLIDATE_TITLES and is_presorted:
+        connections = consolidate_related_titles(
+            connections, connections_list.related_titles
+        )
+    elif SHOULD_CONSOLIDATE_TITLES:
         connections = consolidate_titles(connections)
 
     # remove cycles once more
@@ -105,49 +197,110 @@ def clean(connections_list, min_connections=2):
     return connections
 
 
-def remove_blacklisted_title_starters(connections, blacklist):
-    filtered_connections = connections
-    for word in blacklist:
-        filtered_connections = [
-            connection
-            for connection in connections
-            if not connection.either_title_startswith(word)
-        ]
-    return filtered_connections
-
-
-def exclude_blacklisted_pages(connections, blacklist):
-    blacklist = wikify_concepts(blacklist, False)
+def exclude_blacklisted_pages(connections, blacklist, budget):
+    if budget.exhausted():
+        return connections
+    # only exact titles and their redirects, as a search could turn up some
+    # unrelated page to blacklist
+    store = get_page_store()
+    canonical_titles = store.canonical_titles(
+        [title for title in blacklist if title != ""]
+    )
+    blacklist = set([store.handle(title) for title in canonical_titles.values()])
     blacklist_sums = set(
         [blacklisted_page.summary[:SUMMARY_THRESHOLD] for blacklisted_page in blacklist]
     )
+    blacklist_index = LshIndex(MINHASH_PERMUTATIONS, LSH_BANDS)
+    for blacklisted_page in blacklist:
+        signature = blacklist_index.signature(blacklisted_page.summary)
+        if signature is not None:
+            blacklist_index.add(blacklisted_page.title, signature)
+    # each page is checked once; once the budget runs out the rest are kept unchecked
+    checked_titles = set()
+    excluded_titles = set()
+    for connection in connections:
+        for page in (connection.src, connection.dest):
+            if page.title in checked_titles or budget.exhausted():
+                continue
+            checked_titles.add(page.title)
+            summary = page.summary
+            signature = blacklist_index.signature(summary)
+            if summary[:SUMMARY_THRESHOLD] in blacklist_sums or (
+                signature is not None
+                and len(
+                    blacklist_index.near_duplicates(signature, NEAR_DUPLICATE_THRESHOLD)
+                )
+                > 0
+            ):
+                excluded_titles.add(page.title)
     filtered_connections = [
         connection
         for connection in connections
-        if not connection.either_summary_in(blacklist_sums, SUMMARY_THRESHOLD)
+        if connection.src.title not in excluded_titles
+        and connection.dest.title not in excluded_titles
     ]
     return filtered_connections
 
 
-# Remove connections which are not sufficiently connected to graph
-def remove_dead_ends(connections, min_connections):
+# merge pages whose summaries are near-duplicates into the best connected of them
+def merge_near_duplicates(connections, budget):
+    store = get_page_store()
+    pages = {}
+    degrees = Counter()
+    for connection in connections:
+        for page in (connection.src, connection.dest):
+            pages[page.title] = page
+            degrees[page.title] += connection.weight
+    # only one page of each group goes in the index, so every match is a page to merge into
+    index = LshIndex(MINHASH_PERMUTATIONS, LSH_BANDS)
+    merged_into = {}
+    for title in sorted(pages, key=lambda title: (-degrees[title], len(title), title)):
+        if budget.exhausted():
+            summary = store.known_summary(title)
+        else:
+            summary = pages[title].summary
+        signature = None if summary is None else index.signature(summary)
+        if signature is None:
+            continue
+        duplicates = index.near_duplicates(signature, NEAR_DUPLICATE_THRESHOLD)
+        if len(duplicates) > 0:
+            merged_into[title] = min(duplicates, key=lambda key: (-degrees[key], key))
+        else:
+            index.add(title, signature)
+    if len(merged_into) == 0:
+        return connections
+    text_output(
+        f"Merging {Fore.LIGHTWHITE_EX}{len(merged_into)}{Style.RESET_ALL} near-duplicate pages..."
+    )
+    merged_connections = EdgeStore()
+    for connection in connections:
+        src_title = merged_into.get(connection.src.title, connection.src.title)
+        dst_title = merged_into.get(connection.dest.title, connection.dest.title)
+        merged_connections.add(
+            Edge(pages[src_title], pages[dst_title], connection.weight)
+        )
+    return list(merged_connections)
+
+
+# Remove connections which are not sufficiently connected to graph. Degrees already
+# counted for the connections can be passed in.
+def remove_dead_ends(connections, min_connections, degrees=None):
     min_connections = (
         min_connections if MIN_CONNECTIONS_OVERRIDE == -1 else MIN_CONNECTIONS_OVERRIDE
     )
-    sources = [connection.src.title for connection in connections]
-    targets = [connection.dest.title for connection in connections]
-    connections = list(set(connections))
+    # an edge's weight is the number of times it was found, so it counts that many times
+    if degrees is None:
+        degrees = Counter()
+        for connection in connections:
+            degrees[connection.src.title] += connection.weight
+            degrees[connection.dest.title] += connection.weight
+    # drop repeats in a fixed order so seeded runs stay reproducible
+    connections = list(dict.fromkeys(connections))
     connections = [
         connection
         for connection in connections
-        if not (
-            sources.count(connection.src.title) + targets.count(connection.src.title)
-            < min_connections
-        )
-        and not (
-            sources.count(connection.dest.title) + targets.count(connection.dest.title)
-            < min_connections
-        )
+        if not degrees[connection.src.title] < min_connections
+        and not degrees[connection.dest.title] < min_connections
     ]
     return connections
 
@@ -157,36 +310,138 @@ def remove_cycles(connections):
 
 
 def consolidate_titles(connections):
-    consolidated_connections = set()
+    # with no other connection to pair with, a lone connection stays as it is
+    if len(connections) < 2:
+        return list(connections)
+    consolidated_connections = {}
     for edge, otherEdge in combinations(connections, 2):
-        consolidated_connections.update(edge.consolidate(otherEdge))
+        for consolidated in sorted(
+            edge.consolidate(otherEdge),
+            key=lambda pair_edge: (pair_edge.src.title, pair_edge.dest.title),
+        ):
+            consolidated_connections.setdefault(consolidated, consolidated)
+    return list(consolidated_connections)
+
+
+# consolidate_titles, but only over the pairs of connections whose titles are known to
+# consolidate, as every other pair leaves its connections as they are. It makes the
+# same connections as consolidate_titles, though their weights can differ.
+def consolidate_related_titles(connections, related_titles):
+    if len(connections) < 2:
+        return list(connections)
+    order = {}
+    touching = {}
+    for connection in connections:
+        order[connection] = len(order)
+        touching.setdefault(connection.src.title, []).append(connection)
+        touching.setdefault(connection.dest.title, []).append(connection)
+    consolidated_connections = {}
+    related_connections = {connection: set() for connection in connections}
+    for title, other_title in sorted(related_titles):
+        for edge in touching.get(title, ()):
+            for otherEdge in touching.get(other_title, ()):
+                if edge == otherEdge or otherEdge in related_connections[edge]:
+                    continue
+                related_connections[edge].add(otherEdge)
+                related_connections[otherEdge].add(edge)
+                # in the order consolidate_titles would pair them
+                first, second = sorted((edge, otherEdge), key=order.get)
+                for consolidated in sorted(
+                    first.consolidate(second),
+                    key=lambda pair_edge: (pair_edge.src.title, pair_edge.dest.title),
+                ):
+                    consolidated_connections.setdefault(consolidated, consolidated)
+    # a connection is only consolidated away if every other connection is related to
+    # it, as pairing it with an unrelated one keeps it
+    for connection in connections:
+        if len(related_connections[connection]) < len(connections) - 1:
+            consolidated_connections.setdefault(connection, connection)
     return list(consolidated_connections)
 
 
 # Graph all the nodes on an html file
-def graph_connections(connections_list, wiki_set):
+def graph_connections(connections_list, wiki_set, budget):
     net = Network(height="750px", width="100%", bgcolor="#222222", font_color="white")
     concepts = set([page.title for page in wiki_set])
+    node_attributes = {}
+    summaries = {}
+    # the map is saved with the summaries of its pages, so they are held on to
+    get_page_store().keep_summaries(
+        title
+        for connection in connections_list
+        for title in (connection.src.title, connection.dest.title)
+    )
     for connection in connections_list:
-        src_title = connection.src.title
-        src_sum = shorten_summary(connection.src.summary)
-        src_color = "#937ef2" if src_title in concepts else "#7eacf2"
-        trgt_title = connection.dest.title
-        trgt_sum = shorten_summary(connection.dest.summary)
-        trgt_color = "#937ef2" if trgt_title in concepts else "#7eacf2"
-        net.add_node(src_title, color=src_color)
-        net.add_node(trgt_title, color=trgt_color)
-        net.add_edge(src_title, trgt_title)
-        net.get_node(src_title)["title"] = textwrap.fill(src_sum, 75)
-        net.get_node(trgt_title)["title"] = textwrap.fill(trgt_sum, 75)
+        for page in (connection.src, connection.dest):
+            if page.title not in node_attributes:
+                node_attributes[page.title] = {
+                    "color": "#937ef2" if page.title in concepts else "#7eacf2"
+                }
+                summary = textwrap.fill(get_node_summary(page, budget), 75)
+                # Summaries are loaded on hover so they don't dominate the map size
+                if SHOULD_LAZY_LOAD_SUMMARIES:
+                    summaries[page.title] = summary
+                else:
+                    node_attributes[page.title]["title"] = summary
     file_name = get_file_name(concepts)
-    net.show(file_name)
+    # Collapse communities into super-nodes so huge maps stay responsive in the browser
+    if SHOULD_CLUSTER_LARGE_MAPS and len(node_attributes) > CLUSTER_NODE_THRESHOLD:
+        clusters = add_clustered_map(net, connections_list, node_attributes)
+        text_output(
+            f"Collapsed {len(node_attributes)} pages into {len(clusters)} clusters "
+            "(double-click a cluster to expand it)"
+        )
+        net.show(file_name)
+        add_cluster_script(file_name, clusters)
+    else:
+        for connection in connections_list:
+            src_title = connection.src.title
+            trgt_title = connection.dest.title
+            net.add_node(src_title, **node_attributes[src_title])
+            net.add_node(trgt_title, **node_attributes[trgt_title])
+            net.add_edge(
+                src_title,
+                trgt_title,
+                value=connection.weight,
+                title=f"Found {connection.weight} time(s)",
+            )
+        net.show(file_name)
+    if SHOULD_LAZY_LOAD_SUMMARIES:
+        add_summary_script(file_name, summaries)
     text_output(f'Wrote map to "{Fore.LIGHTCYAN_EX}{file_name}{Style.RESET_ALL}"')
 
 
+# Saves the map next to its html file so it can be extended later
+def save_map_state(connections_list, wiki_set, seen_pages, searched_pairs):
+    store = get_page_store()
+    concepts = set([page.title for page in wiki_set])
+    summaries = {}
+    revisions = {}
+    for connection in connections_list:
+        for page in (connection.src, connection.dest):
+            summary = store.known_summary(page.title)
+            if summary is not None:
+                summaries[page.title] = summary
+            revision = store.known_revision(page.title)
+            if revision is not None:
+                revisions[page.title] = revision
+    file_name = get_file_name(concepts)[: -len(".html")] + ".json"
+    save_map(
+        file_name,
+        concepts,
+        connections_list,
+        summaries,
+        seen_pages,
+        searched_pairs,
+        revisions,
+    )
+    text_output(f'Saved map state to "{Fore.LIGHTCYAN_EX}{file_name}{Style.RESET_ALL}"')
+
+
 # Create file name for output based on input args
 def get_file_name(concepts):
-    concept_list = list(concepts)
+    # sorted, so the same concepts always make the same file names
+    concept_list = sorted(concepts)
     if len(concept_list) == 0:
         return "influence_map.html"
     elif len(concept_list) == 1:
@@ -199,6 +454,15 @@ def get_file_name(concepts):
         return "influence_map({0},{1},{2}...).html".format(*concept_list[:3])
 
 
+# Gets the shortened summary of a node, or only one already fetched once the budget
+# is used up
+def get_node_summary(page, budget):
+    if budget.exhausted():
+        summary = get_page_store().known_summary(page.title)
+        return "" if summary is None else shorten_summary(summary)
+    return shorten_summary(page.summary)
+
+
 # Simplify a wiki article summary (buggy, eh...)
 def shorten_summary(summary):
     summary = "".join(re.split("\(|\)|\[|\]", summary)[::2])
@@ -208,28 +472,59 @@ def shorten_summary(summary):
 
 
 # Start up the connection recursion and handle setup and cleanup of connections
-def connect_concepts(wiki_set, wndw):
-    connections_list = []
-    wiki_set_values = tuple(wiki_set)
-    seen_pages = set(wiki_set_values)
-    important_words = get_important_words(seen_pages)
+def connect_concepts(wiki_set, wndw, budget, seen_pages, searched_pairs):
+    connections_list = search_concepts(
+        wiki_set, wndw, budget, seen_pages, searched_pairs
+    )
+    wndw.write_event_value("-POST_PROCESSING-", 0)
+    connections_list = EdgeStore(clean(connections_list, budget, len(wiki_set)))
+    shallow_link_seen_pages(connections_list, wndw, budget)
+    return connections_list
+
+
+# Searches between every pair of concepts that hasn't been searched yet, stopping
+# early on Ctrl-C or once the budget is used up
+def search_concepts(wiki_set, wndw, budget, seen_pages, searched_pairs):
+    connections_list = CleaningEdgeStore()
+    # in a fixed order so seeded runs search the pairs the same way
+    wiki_set_values = tuple(sorted(wiki_set, key=lambda page: page.title))
+    seen_pages.update(page.title for page in wiki_set_values)
+    important_words = get_important_words(wiki_set_values)
+    pairs = [
+        (page, otherPage)
+        for page in wiki_set_values
+        for otherPage in wiki_set_values
+        if (page.title, otherPage.title) not in searched_pairs
+    ]
     try:
-        prog_max = (
-            (len(wiki_set_values) ** 2)
-            * (DEFAULT_DEPTH_LIMIT**2)
-            * DEFAULT_WIDTH_LIMIT
-        )
+        prog_max = len(pairs) * (DEFAULT_DEPTH_LIMIT**2) * DEFAULT_WIDTH_LIMIT
         cur = 0
-        wndw.write_event_value("-SET_PROGRESS_MAX-", prog_max)
-        wndw.write_event_value("-SEARCHING-", 0)
-        for page in wiki_set_values:
-            for otherPage in wiki_set_values:
 
-                def increment_progress():
-                    nonlocal cur
-                    cur += 1
-                    wndw.write_event_value("-SET_PROGRESS-", cur)
+        def increment_progress():
+            nonlocal cur
+            cur += 1
+            wndw.write_event_value("-SET_PROGRESS-", cur)
 
+        if BEST_FIRST_SEARCH:
+            prog_max = get_fetch_budget(len(pairs))
+        wndw.write_event_value("-SET_PROGRESS_MAX-", prog_max)
+        wndw.write_event_value("-SEARCHING-", 0)
+        if BEST_FIRST_SEARCH:
+            best_first_connections(
+                connections_list,
+                wiki_set_values,
+                seen_pages,
+                prog_max,
+                increment_progress,
+                budget,
+            )
+            # the search covers all pairs at once, so it only counts if it finished
+            if not budget.crawl_exhausted(connections_list.node_count()):
+                searched_pairs.update(
+                    (page.title, otherPage.title) for page, otherPage in pairs
+                )
+        else:
+            for page, otherPage in pairs:
                 find_connections(
                     connections_list,
                     seen_pages,
@@ -237,18 +532,180 @@ def connect_concepts(wiki_set, wndw):
                     otherPage,
                     important_words,
                     increment_progress,
+                    budget,
+                    # read now so the limits can be changed between runs
+                    DEFAULT_DEPTH_LIMIT,
+                    DEFAULT_WIDTH_LIMIT,
                 )
+                # a pair cut short by the budget is searched again next time
+                if not budget.crawl_exhausted(connections_list.node_count()):
+                    searched_pairs.add((page.title, otherPage.title))
+        if budget.cancelled():
+            text_output(
+                f"{Fore.MAGENTA}Search cancelled, mapping what was found so far.{Style.RESET_ALL}"
+            )
+        elif budget.crawl_exhausted(connections_list.node_count()):
+            text_output(
+                f"{Fore.MAGENTA}Search budget used up, stopping early.{Style.RESET_ALL}"
+            )
     except KeyboardInterrupt:
-        wndw.write_event_value("-POST_PROCESSING-", 0)
-        connections_list = clean(connections_list, len(wiki_set_values))
-        shallow_link_seen_pages(connections_list, wndw)
-        return connections_list
-    wndw.write_event_value("-POST_PROCESSING-", 0)
-    connections_list = clean(connections_list, len(wiki_set_values))
-    shallow_link_seen_pages(connections_list, wndw)
+        # map what was found so far without fetching anything else
+        budget.cancel()
     return connections_list
 
 
+# Extends a saved map to a new list of concepts. Only the concept pairs the saved map
+# hasn't searched are searched, and only the part of the map the new connections
+# touch is cleaned and cross-referenced again. A refresh first brings the saved map
+# up to date with pages that changed since it was saved.
+def extend_map(state, wiki_set, wndw, budget, refresh=False):
+    concepts = set(page.title for page in wiki_set)
+    pages = restore_pages(state)
+    pages.update((page.title, page) for page in wiki_set)
+    old_connections = EdgeStore(
+        Edge(pages[src_title], pages[dst_title], weight)
+        for src_title, dst_title, weight in state["edges"]
+    )
+    removed_concepts = set(state["concepts"]) - concepts
+    if len(removed_concepts) > 0:
+        old_connections = drop_concepts(old_connections, removed_concepts, concepts)
+    changed_titles = set()
+    if refresh:
+        old_connections, changed_titles = refresh_connections(old_connections, budget)
+    seen_pages = state["seen"]
+    # pairs with a changed concept are searched again
+    searched_pairs = set(
+        pair
+        for pair in state["searched"]
+        if pair[0] in concepts
+        and pair[1] in concepts
+        and pair[0] not in changed_titles
+        and pair[1] not in changed_titles
+    )
+    text_output(
+        f"Extending map of {Fore.LIGHTWHITE_EX}{len(state['concepts'])}{Style.RESET_ALL} concepts to {Fore.LIGHTWHITE_EX}{len(concepts)}{Style.RESET_ALL}..."
+    )
+    new_connections = search_concepts(
+        wiki_set, wndw, budget, seen_pages, searched_pairs
+    )
+
+    # the region is the new connections plus every old one touching their pages, so
+    # the pages of new connections are cleaned with their full degree
+    affected_titles = set()
+    for connection in new_connections:
+        affected_titles.add(connection.src.title)
+        affected_titles.add(connection.dest.title)
+    region = list(new_connections) + [
+        connection
+        for connection in old_connections
+        if connection.src.title in affected_titles
+        or connection.dest.title in affected_titles
+    ]
+    wndw.write_event_value("-POST_PROCESSING-", 0)
+    connections_list = old_connections
+    for connection in clean(region, budget, len(concepts)):
+        if connection not in connections_list:
+            connections_list.add(connection)
+    shallow_link_seen_pages(
+        connections_list, wndw, budget, affected_titles | changed_titles
+    )
+    return connections_list, seen_pages, searched_pairs
+
+
+# Finds the pages of a map that changed since it was saved and drops the connections
+# their current revisions no longer link. Returns the remaining connections and the
+# changed titles; their summaries and links get fetched again as needed.
+def refresh_connections(connections, budget):
+    titles = set()
+    for connection in connections:
+        titles.add(connection.src.title)
+        titles.add(connection.dest.title)
+    text_output(
+        f"Checking {Fore.LIGHTWHITE_EX}{len(titles)}{Style.RESET_ALL} pages for changes..."
+    )
+    changed_titles = get_page_store().revalidate(sorted(titles))
+    text_output(
+        f"{Fore.LIGHTWHITE_EX}{len(changed_titles)}{Style.RESET_ALL} pages changed since the map was saved."
+    )
+    if len(changed_titles) == 0:
+        return connections, changed_titles
+    neighbour_titles = set()
+    for connection in connections:
+        if connection.src.title in changed_titles:
+            neighbour_titles.add(connection.dest.title)
+        if connection.dest.title in changed_titles:
+            neighbour_titles.add(connection.src.title)
+    # a connection stands if a link between its pages exists either way round
+    linked = set()
+    for source_titles, target_titles in (
+        (changed_titles, neighbour_titles),
+        (neighbour_titles, changed_titles),
+    ):
+        for source_batch in batched(sorted(source_titles)):
+            for target_batch in batched(sorted(target_titles)):
+                for src_title, dst_title in get_links_between(
+                    source_batch, target_batch, budget
+                ):
+                    linked.add(frozenset((src_title, dst_title)))
+    # links that couldn't be checked in budget are given the benefit of the doubt
+    if budget.exhausted():
+        return connections, changed_titles
+    return (
+        EdgeStore(
+            connection
+            for connection in connections
+            if (
+                connection.src.title not in changed_titles
+                and connection.dest.title not in changed_titles
+            )
+            or frozenset((connection.src.title, connection.dest.title)) in linked
+        ),
+        changed_titles,
+    )
+
+
+# Rebuilds the pages of a saved map, with their summaries if they were saved
+def restore_pages(state):
+    store = get_page_store()
+    # revisions are restored for every page, not just the summaries the cache keeps
+    for title, revid in state["revisions"].items():
+        store.set_revision(title, revid)
+    store.keep_summaries(state["summaries"])
+    pages = {}
+    for src_title, dst_title, weight in state["edges"]:
+        for title in (src_title, dst_title):
+            if title in state["summaries"]:
+                store.set_summary(title, state["summaries"][title])
+            pages[title] = store.handle(title)
+    return pages
+
+
+# Drops removed concepts from a map along with everything that no longer connects
+# to the remaining concepts
+def drop_concepts(connections, removed_concepts, concepts):
+    neighbours = {}
+    for connection in connections:
+        if (
+            connection.src.title in removed_concepts
+            or connection.dest.title in removed_concepts
+        ):
+            continue
+        neighbours.setdefault(connection.src.title, set()).add(connection.dest.title)
+        neighbours.setdefault(connection.dest.title, set()).add(connection.src.title)
+    reachable = set(title for title in concepts if title in neighbours)
+    to_visit = list(reachable)
+    while len(to_visit) > 0:
+        for title in neighbours[to_visit.pop()]:
+            if title not in reachable:
+                reachable.add(title)
+                to_visit.append(title)
+    return EdgeStore(
+        connection
+        for connection in connections
+        if connection.src.title in reachable and connection.dest.title in reachable
+    )
+
+
 # Builds a set of important terms from the target topics' summaries
 def get_important_words(wiki_set):
     text_output("Generating set of key words...")
@@ -275,30 +732,78 @@ def get_page_importance(wiki_page, important_words):
     return importantness
 
 
-# Connect up any nodes whose pages reference each other
-def shallow_link_seen_pages(found_connections, wndw):
-    current_pages = set()
+# Connect up any nodes whose pages reference each other. If only_titles is given,
+# only links to and from those pages are checked.
+def shallow_link_seen_pages(found_connections, wndw, budget, only_titles=None):
+    current_pages = {}
     for connection in found_connections:
-        current_pages.add(connection.src)
-        current_pages.add(connection.dest)
+        current_pages[connection.src.title] = connection.src
+        current_pages[connection.dest.title] = connection.dest
     text_output(
         f"Checking for additional cross-references between {Fore.LIGHTWHITE_EX}{len(current_pages)}{Style.RESET_ALL} pages..."
     )
-    sleep_time = SLEEPER_DELAY * ((1 / len(current_pages)) ** (1 / 4))
+    if len(current_pages) == 0:
+        return
+    all_titles = list(current_pages.keys())
+    if only_titles is None:
+        title_lists = [(all_titles, all_titles)]
+    else:
+        only_titles = [title for title in only_titles if title in current_pages]
+        title_lists = [(all_titles, only_titles), (only_titles, all_titles)]
+    title_batches = [
+        (source_batch, target_batch)
+        for source_titles, target_titles in title_lists
+        for source_batch in batched(source_titles)
+        for target_batch in batched(target_titles)
+    ]
+    if len(title_batches) == 0:
+        return
+    sleep_time = SLEEPER_DELAY * ((1 / len(title_batches)) ** (1 / 4))
     cur = 0
-    wndw.write_event_value("-SET_PROGRESS_MAX-", len(current_pages) ** 2)
-    for this_page in current_pages:
+    wndw.write_event_value("-SET_PROGRESS_MAX-", len(title_batches))
+    for source_batch, target_batch in title_batches:
+        budget.wait_if_paused()
+        if budget.exhausted():
+            break
         sleep(sleep_time)
-        page_links = get_page_links(this_page)
-        for other_page in current_pages:
-            if other_page != this_page and other_page in page_links:
-                found_connections.append(create_edge(this_page, other_page))
-            cur += 1
-            wndw.write_event_value("-SET_PROGRESS-", cur)
+        for src_title, dst_title in get_links_between(
+            source_batch, target_batch, budget
+        ):
+            if (
+                src_title != dst_title
+                and src_title in current_pages
+                and dst_title in current_pages
+            ):
+                found_connections.add(
+                    create_edge(current_pages[src_title], current_pages[dst_title])
+                )
+        cur += 1
+        wndw.write_event_value("-SET_PROGRESS-", cur)
+
+
+# Gets which of the source pages link to which of the target pages. Gives up with
+# no links once the budget runs out while being throttled.
+def get_links_between(source_titles, target_titles, budget):
+    links_gotten = False
+    counter = 1
+    while not links_gotten:
+        try:
+            links = get_wiki().links_between(source_titles, target_titles)
+            links_gotten = True
+        except JSONDecodeError:
+            text_output(
+                f"{Fore.MAGENTA}Being throttled, backing off ({counter})...{Style.RESET_ALL}"
+            )
+            if not budget.sleep(SLEEPER_DELAY * (math.e**counter)):
+                return []
+        finally:
+            counter += 1
+    return links
 
 
-# Gets the set of links from a given page
-def get_page_links(page):
+# Gets the set of links from a given page. Gives up with no links once the budget
+# runs out while being throttled.
+def get_page_links(page, budget):
     page_links_gotten = False
     counter = 1
     while not page_links_gotten:
@@ -309,7 +814,8 @@ def get_page_links(page):
             text_output(
                 f"{Fore.MAGENTA}Being throttled, backing off ({counter})...{Style.RESET_ALL}"
             )
-            sleep(SLEEPER_DELAY * (math.e**counter))
+            if not budget.sleep(SLEEPER_DELAY * (math.e**counter)):
+                return set()
         finally:
             counter += 1
     return page_links
@@ -323,10 +829,16 @@ def find_connections(
     target_page,
     important_words,
     increment_progress,
+    budget,
     depth_limit=DEFAULT_DEPTH_LIMIT,
     width_limit=DEFAULT_WIDTH_LIMIT,
 ):
-    if depth_limit == 0 and cur_page != target_page:
+    # out of budget or cancelled, leave the rest for post-processing
+    budget.wait_if_paused()
+    if budget.crawl_exhausted(found_connections.node_count()):
+        return found_connections
+
+    if depth_limit == 0:
         increment_progress()
         return found_connections
 
@@ -336,18 +848,21 @@ def find_connections(
     sleep(SLEEPER_DELAY)
 
     cur_page_links = cur_page.links
+    # the link list isn't needed again once the page is expanded
+    get_page_store().evict_links(cur_page.title)
 
-    # Connect new pages to exisiting nodes
+    # Connect new pages to exisiting nodes. Pages are matched by title, as every link
+    # list holds new page objects.
     linked_pages = list(cur_page_links.values())
     for this_page in linked_pages:
-        if this_page in seen_pages:
-            found_connections.append(create_edge(cur_page, this_page))
+        if this_page.title in seen_pages:
+            found_connections.add(create_edge(cur_page, this_page))
 
-    seen_pages.update(linked_pages)
+    seen_pages.update(page.title for page in linked_pages)
 
     # Connection found, great
     if ALLOW_DIRECT_LINK_BYPASS and target_page.title in cur_page_links.keys():
-        found_connections.append(create_edge(cur_page, target_page, 1))
+        found_connections.add(create_edge(cur_page, target_page, 1))
     # No connection found in immediate vicinity
     else:
         # Finds articles that have similar topics mentioned in the summary and selects the best number allowed by
@@ -363,6 +878,9 @@ def find_connections(
         # I arbitrarily chose to choose links completely randomly in this case.
         if len(linked_pages) > width_limit:
             linked_pages = random.sample(linked_pages, width_limit)
+        # fetch the next depth in the background while this one is searched
+        for sub_page in linked_pages:
+            get_page_store().prefetch(sub_page.title, links=depth_limit > 1)
         # Searches through the links allowanced to linked_pages
         for sub_page in linked_pages:
             find_connections(
@@ -372,9 +890,90 @@ def find_connections(
                 target_page,
                 important_words,
                 increment_progress,
+                budget,
                 depth_limit - 1,
+                width_limit,
             )
-            found_connections.append(create_edge(cur_page, sub_page))
+            found_connections.add(create_edge(cur_page, sub_page))
+
+
+# Number of pages best-first search may expand, roughly what the recursive search
+# fetches for the same concept pairs
+def get_fetch_budget(pair_count):
+    if pair_count == 0:
+        return 0
+    if FETCH_BUDGET != -1:
+        return FETCH_BUDGET
+    return pair_count * DEFAULT_WIDTH_LIMIT ** (DEFAULT_DEPTH_LIMIT - 1)
+
+
+# Expands the frontier page most likely to connect the concepts, as ranked by a
+# PageRank personalized on the concepts over the graph found so far
+def best_first_connections(
+    found_connections,
+    wiki_set_values,
+    seen_pages,
+    fetch_budget,
+    increment_progress,
+    budget,
+):
+    pages = {page.title: page for page in wiki_set_values}
+    concepts = list(pages.keys())
+    parents = {}
+    links = {}
+    ranks = {title: 1 / len(concepts) for title in concepts}
+    tie_breaker = count()
+    frontier = [(-ranks[title], next(tie_breaker), title) for title in concepts]
+    heapq.heapify(frontier)
+    for expansion in range(fetch_budget):
+        budget.wait_if_paused()
+        if budget.crawl_exhausted(found_connections.node_count()):
+            break
+        # re-rank the whole frontier now and then as the graph fills in
+        if expansion > 0 and expansion % PAGE_RANK_INTERVAL == 0:
+            ranks = personalized_page_rank(links, concepts, PAGE_RANK_DAMPING)
+            frontier = [
+                (-ranks.get(title, 0), next(tie_breaker), title)
+                for title in pages
+                if title not in links
+            ]
+            heapq.heapify(frontier)
+        cur_title = None
+        while len(frontier) > 0 and cur_title is None:
+            title = heapq.heappop(frontier)[2]
+            if title not in links:
+                cur_title = title
+        if cur_title is None:
+            break
+        cur_page = pages[cur_title]
+        text_output(
+            f"Expanding {Fore.LIGHTYELLOW_EX}{cur_title}{Style.RESET_ALL} (priority {ranks.get(cur_title, 0):.4f})."
+        )
+        sleep(SLEEPER_DELAY)
+
+        if cur_title in parents:
+            found_connections.add(create_edge(pages[parents[cur_title]], cur_page))
+        # in title order, as links that rank equally are expanded in the order queued
+        linked_pages = sorted(
+            get_page_links(cur_page, budget), key=lambda page: page.title
+        )
+        get_page_store().evict_links(cur_title)
+        links[cur_title] = [page.title for page in linked_pages]
+        seen_pages.update(links[cur_title])
+        for this_page in linked_pages:
+            # connect to existing nodes, queue up the rest
+            if this_page.title in pages:
+                found_connections.add(create_edge(cur_page, pages[this_page.title]))
+            else:
+                pages[this_page.title] = this_page
+                parents[this_page.title] = cur_title
+                estimate = (
+                    PAGE_RANK_DAMPING * ranks.get(cur_title, 0) / len(linked_pages)
+                )
+                heapq.heappush(
+                    frontier, (-estimate, next(tie_breaker), this_page.title)
+                )
+        increment_progress()
 
 
 # Builds an edge to connect the two related nodes for the given pages
@@ -386,21 +985,134 @@ def create_edge(src_page, dst_page, wght=1):
     return edge
 
 
-# Gets the relevant wiki articles for a list of concepts
-def wikify_concepts(concept_list, verbose=True):
-    wiki = wikipediaapi.Wikipedia("en")
+# Gets the wiki client shared by the whole process
+def get_wiki():
+    global wiki_client
+    global wiki_client_settings
+    # a new client is made whenever the settings change between runs
+    settings = (CASSETTE_FILE, CASSETTE_MODE, REPLAY_LATENCY)
+    if wiki_client is None or settings != wiki_client_settings:
+        wiki_client = WikiClient(
+            "en", SUMMARY_CHAR_LIMIT, BLACKLIST_TITLES, BLACKLIST_TITLE_STARTERS
+        )
+        if CASSETTE_FILE != "":
+            wiki_client.cassette = Cassette(
+                CASSETTE_FILE, CASSETTE_MODE, REPLAY_LATENCY
+            )
+        wiki_client_settings = settings
+    return wiki_client
+
+
+# Makes the set that remembers which pages the search has seen. A bloom filter keeps
+# memory bounded on huge crawls, at the cost of treating about SEEN_SET_ERROR_RATE of
+# unseen pages as seen.
+def make_seen_set():
+    if SEEN_SET == "bloom":
+        return BloomSeenSet(
+            SEEN_SET_CAPACITY,
+            SEEN_SET_ERROR_RATE,
+            SEEN_SET_FILE if SEEN_SET_FILE != "" else None,
+        )
+    return set()
+
+
+# Gets the page store shared by the whole process
+def get_page_store():
+    global page_store
+    global page_store_settings
+    # a new store is made whenever its client or the cache server changes
+    settings = (get_wiki(), CACHE_SERVER)
+    if page_store is None or settings != page_store_settings:
+        if page_store is not None:
+            page_store.close()
+        shared_cache = None
+        if CACHE_SERVER != "":
+            shared_cache = CacheClient(CACHE_SERVER)
+        page_store = PageStore(
+            get_wiki(),
+            SUMMARY_CACHE_SIZE,
+            LINK_CACHE_SIZE,
+            shared_cache=shared_cache,
+            prefetch_workers=PREFETCH_WORKERS,
+            prefetch_interval=PREFETCH_INTERVAL,
+        )
+        page_store_settings = settings
+    return page_store
+
+
+# Gets the relevant wiki articles for a list of concepts, optionally writing a report
+# of how each concept was resolved before anything else is fetched
+def wikify_concepts(concept_list, verbose=True, report=False):
+    wiki = get_wiki()
+    store = get_page_store()
+    resolutions = resolve_concepts(concept_list)
     wiki_set = set()
-    for concept in concept_list:
-        wiki_page = wiki.page(concept)
-        if wiki_page.exists():
-            wiki_set.add(wiki_page)
+    for concept, (status, title) in resolutions.items():
+        if title is None:
             if verbose:
                 text_output(
-                    f"Found wiki page for {Fore.LIGHTRED_EX}{concept}{Style.RESET_ALL} ({wiki_page.fullurl})."
+                    f"{Fore.MAGENTA}No wiki page found for {concept}, skipping it.{Style.RESET_ALL}"
                 )
+            continue
+        wiki_set.add(store.handle(title))
+        if verbose:
+            text_output(
+                f"Found wiki page for {Fore.LIGHTRED_EX}{concept}{Style.RESET_ALL} ({wiki.page_url(title)})."
+            )
+    if report:
+        save_resolution_report(resolutions, wiki_set)
     return wiki_set
 
 
+# Resolves concepts to canonical titles, MAX_TITLES_PER_QUERY at a time and following
+# redirects. Concepts without a page are looked up with the wiki's search, all at
+# once. Returns {concept: (status, title)}, where status is "found", "redirected",
+# "searched" or "missing" and title is None for missing concepts.
+def resolve_concepts(concept_list):
+    store = get_page_store()
+    # entries split out of a file can carry stray whitespace and repeats
+    concepts = list(
+        dict.fromkeys(" ".join(concept.split()) for concept in concept_list)
+    )
+    concepts = [concept for concept in concepts if concept != ""]
+    canonical_titles = store.canonical_titles(concepts)
+    missing = [concept for concept in concepts if concept not in canonical_titles]
+    suggested_titles = {}
+    if len(missing) > 0:
+        suggestions = get_wiki().search_titles(missing)
+        suggested_canonical = store.canonical_titles(list(suggestions.values()))
+        for concept, title in suggestions.items():
+            if title in suggested_canonical:
+                suggested_titles[concept] = suggested_canonical[title]
+    resolutions = {}
+    for concept in concepts:
+        if concept in canonical_titles:
+            title = canonical_titles[concept]
+            # only the first letter of a title is case-insensitive
+            if title == concept[:1].upper() + concept[1:].replace("_", " "):
+                resolutions[concept] = ("found", title)
+            else:
+                resolutions[concept] = ("redirected", title)
+        elif concept in suggested_titles:
+            resolutions[concept] = ("searched", suggested_titles[concept])
+        else:
+            resolutions[concept] = ("missing", None)
+    return resolutions
+
+
+# Writes how each concept was resolved next to where the map will be saved
+def save_resolution_report(resolutions, wiki_set):
+    concepts = set([page.title for page in wiki_set])
+    file_name = get_file_name(concepts)[: -len(".html")] + ".resolution.tsv"
+    with open(file_name, "w", encoding="utf-8") as report_file:
+        report_file.write("concept\tstatus\ttitle\n")
+        for concept, (status, title) in resolutions.items():
+            report_file.write(f"{concept}\t{status}\t{title or ''}\n")
+    text_output(
+        f'Wrote concept resolution report to "{Fore.LIGHTCYAN_EX}{file_name}{Style.RESET_ALL}"'
+    )
+
+
 # Handles the command-line arguments
 def handle_args(args):
     if len(args) < 1:
@@ -501,6 +1213,7 @@ def tail(string, n):
 
 # runner for the gui app
 def gui_main():
+    global crawl_budget
     gui.theme("DarkBlack")
 
     layout = [
@@ -522,6 +1235,13 @@ def gui_main():
                             default=True,
                         )
                     ],
+                    [
+                        gui.Checkbox(
+                            "Best-first search",
+                            key="best_first_search",
+                            default=False,
+                        )
+                    ],
                 ]
             ),
             gui.Column(
@@ -569,6 +1289,11 @@ def gui_main():
                     [gui.Text("Minimum connections override:")],
                     [gui.Text("Minimum connections multiplier:")],
                     [gui.Text("Summary threshold:")],
+                    [gui.Text("Fetch budget:")],
+                    [gui.Text("Max requests:")],
+                    [gui.Text("Deadline (seconds):")],
+                    [gui.Text("Max nodes:")],
+                    [gui.Text("Random seed:")],
                 ],
             ),
             gui.Column(
@@ -594,6 +1319,41 @@ def gui_main():
                             size=(5, 1),
                         )
                     ],
+                    [
+                        gui.InputText(
+                            key="fetch_budget",
+                            default_text="-1",
+                            size=(5, 1),
+                        )
+                    ],
+                    [
+                        gui.InputText(
+                            key="max_requests",
+                            default_text="-1",
+                            size=(5, 1),
+                        )
+                    ],
+                    [
+                        gui.InputText(
+                            key="deadline",
+                            default_text="-1",
+                            size=(5, 1),
+                        )
+                    ],
+                    [
+                        gui.InputText(
+                            key="max_nodes",
+                            default_text="-1",
+                            size=(5, 1),
+                        )
+                    ],
+                    [
+                        gui.InputText(
+                            key="random_seed",
+                            default_text="-1",
+                            size=(5, 1),
+                        )
+                    ],
                 ],
             ),
         ],
@@ -608,8 +1368,21 @@ def gui_main():
         [gui.InputText(key="input_file")],
         [gui.Text("Enter the delimineter value (default newline):")],
         [gui.InputText(key="delim")],
+        [gui.Text("Enter the name of a saved map (.json) to extend (optional):")],
+        [gui.InputText(key="extend_file")],
+        [
+            gui.Checkbox(
+                "Refresh pages that changed since the map was saved",
+                key="refresh",
+                default=False,
+            )
+        ],
+        [gui.Text("Enter the address of a shared page cache (host:port, optional):")],
+        [gui.InputText(key="cache_server")],
         [
             gui.Button("Execute Search"),
+            gui.Button("Pause", disabled=True),
+            gui.Button("Cancel", disabled=True),
             gui.Button("Exit"),
         ],
         [gui.Text(key="output_text", size=(80, 10), text_color="light blue")],
@@ -645,27 +1418,62 @@ def gui_main():
         if event == "-POST_PROCESSING-":
             window["progress_text"].update("Post Processing...")
         if event == "-FINISHED-":
-            window["progress_text"].update("Finished!")
+            if values["-FINISHED-"] == "":
+                window["progress_text"].update("Finished!")
+            else:
+                window["progress_text"].update("Search failed, see the output.")
+            window["Pause"].update("Pause", disabled=True)
+            window["Cancel"].update(disabled=True)
+            window["Execute Search"].update(disabled=False)
+        if event == "Pause" and crawl_budget is not None:
+            if window["Pause"].get_text() == "Pause":
+                crawl_budget.pause()
+                window["Pause"].update("Resume")
+                window["progress_text"].update("Paused")
+            else:
+                crawl_budget.resume()
+                window["Pause"].update("Pause")
+                window["progress_text"].update("Search Progress:")
+        if event == "Cancel" and crawl_budget is not None:
+            # stop the crawl and map the connections found so far
+            crawl_budget.cancel()
+            window["Pause"].update("Pause", disabled=True)
+            window["Cancel"].update(disabled=True)
+            window["progress_text"].update("Cancelling, mapping partial results...")
         if event == "Execute Search":
             # set constants
             global ALLOW_DIRECT_LINK_BYPASS
+            global BEST_FIRST_SEARCH
+            global FETCH_BUDGET
             global CONSOLIDATE_TITLES
             global SEARCH_INTENSITY
             global SLEEPER_DELAY
-            global DEPTH_LIMIT
-            global WIDTH_LIMIT
+            global DEFAULT_DEPTH_LIMIT
+            global DEFAULT_WIDTH_LIMIT
             global MIN_CONNECTIONS_OVERRIDE
             global MIN_CONNECTIONS_MULTIPLIER
             global SUMMARY_THRESHOLD
+            global MAX_REQUESTS
+            global DEADLINE
+            global MAX_NODES
+            global CACHE_SERVER
+            global RANDOM_SEED
             ALLOW_DIRECT_LINK_BYPASS = values["allow_direct_link_bypass"]
+            BEST_FIRST_SEARCH = values["best_first_search"]
+            FETCH_BUDGET = int(values["fetch_budget"])
             CONSOLIDATE_TITLES = values["consolidate_titles"]
             SEARCH_INTENSITY = int(values["search_intensity"])
             SLEEPER_DELAY = float(values["sleeper_delay"])
-            DEPTH_LIMIT = int(values["depth_limit"])
-            WIDTH_LIMIT = int(values["width_limit"])
+            DEFAULT_DEPTH_LIMIT = int(values["depth_limit"])
+            DEFAULT_WIDTH_LIMIT = int(values["width_limit"])
             MIN_CONNECTIONS_OVERRIDE = int(values["min_connections_override"])
             MIN_CONNECTIONS_MULTIPLIER = int(values["min_connections_multiplier"])
             SUMMARY_THRESHOLD = int(values["summary_threshold"])
+            MAX_REQUESTS = int(values["max_requests"])
+            DEADLINE = float(values["deadline"])
+            MAX_NODES = int(values["max_nodes"])
+            CACHE_SERVER = values["cache_server"].strip()
+            RANDOM_SEED = int(values["random_seed"])
 
             if values["input_file"] == "" and values["input_text"] == "":
                 bad_args_message_gui()
@@ -677,8 +1485,23 @@ def gui_main():
                     concept_list = values["input_text"].strip().split(delim)
                 if values["input_file"] != "":
                     concept_list = handle_file([values["input_file"], delim])
+                # made here, so Pause and Cancel act on this run from the start
+                crawl_budget = Budget(
+                    MAX_REQUESTS, DEADLINE, MAX_NODES, RESERVED_BUDGET_FRACTION
+                )
+                window["Execute Search"].update(disabled=True)
+                window["Pause"].update(disabled=False)
+                window["Cancel"].update(disabled=False)
                 threading.Thread(
-                    target=main, args=(window, concept_list), daemon=True
+                    target=main,
+                    args=(
+                        window,
+                        concept_list,
+                        crawl_budget,
+                        values["extend_file"],
+                        values["refresh"],
+                    ),
+                    daemon=True,
                 ).start()
 
     window.close()
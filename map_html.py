@@ -0,0 +1,59 @@
+import base64
+import json
+import gzip
+
+# Decodes the compressed summaries the first time a page is hovered and sets the
+# hovered node's tooltip from them
+SUMMARY_SCRIPT = """
+var summaryRequest = null;
+function loadSummaries() {
+    if (summaryRequest === null) {
+        var data = atob(document.getElementById("summary-data").textContent);
+        var bytes = Uint8Array.from(data, function (char) {
+            return char.charCodeAt(0);
+        });
+        var stream = new Blob([bytes]).stream().pipeThrough(
+            new DecompressionStream("gzip")
+        );
+        summaryRequest = new Response(stream).json();
+    }
+    return summaryRequest;
+}
+network.setOptions({ interaction: { hover: true } });
+network.on("hoverNode", function (params) {
+    var node = nodes.get(params.node);
+    if (node === null || node.title !== undefined) {
+        return;
+    }
+    loadSummaries().then(function (summaries) {
+        if (params.node in summaries && nodes.get(params.node) !== null) {
+            nodes.update({ id: params.node, title: summaries[params.node] });
+        }
+    });
+});
+"""
+
+
+# Escapes json so it can sit inside a script element
+def script_json(data):
+    return json.dumps(data).replace("</", "<\\/")
+
+
+# Adds scripts to the end of the body of a written map
+def add_scripts(file_name, scripts):
+    with open(file_name, "r", encoding="utf-8") as map_file:
+        html = map_file.read()
+    index = html.rindex("</body>")
+    with open(file_name, "w", encoding="utf-8") as map_file:
+        map_file.write(html[:index] + scripts + html[index:])
+
+
+# Embeds the node summaries as a compressed blob that is only decoded on hover
+def add_summary_script(file_name, summaries):
+    data = gzip.compress(json.dumps(summaries).encode("utf-8"))
+    add_scripts(
+        file_name,
+        '<script type="application/octet-stream" id="summary-data">'
+        f"{base64.b64encode(data).decode('ascii')}</script>\n"
+        f"<script>{SUMMARY_SCRIPT}</script>\n",
+    )
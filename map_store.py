@@ -0,0 +1,57 @@
+from BloomSeenSet import BloomSeenSet, bloom_from_state
+import json
+import os
+
+
+# Writes a map and the state of its search to a file so the map can be extended later
+def save_map(
+    file_name,
+    concepts,
+    connections,
+    summaries,
+    seen_titles,
+    searched_pairs,
+    revisions=None,
+):
+    state = {
+        "concepts": sorted(concepts),
+        "edges": [
+            [connection.src.title, connection.dest.title, connection.weight]
+            for connection in connections
+        ],
+        "summaries": summaries,
+        # the revision each summary is from, so a refresh can skip unchanged pages
+        "revisions": revisions if revisions is not None else {},
+        "searched": sorted([list(pair) for pair in searched_pairs]),
+    }
+    # a bloom filter can't list its titles, so the filter itself is saved. Bits kept
+    # in a file get a copy of their own next to the map.
+    if isinstance(seen_titles, BloomSeenSet):
+        bits_file_name = os.path.splitext(file_name)[0] + ".seen"
+        state["seen"] = []
+        state["seen_filter"] = seen_titles.to_state(bits_file_name)
+        if "file" in state["seen_filter"]:
+            state["seen_filter"]["file"] = os.path.basename(bits_file_name)
+    else:
+        state["seen"] = sorted(seen_titles)
+    with open(file_name, "w", encoding="utf-8") as state_file:
+        json.dump(state, state_file)
+
+
+# Reads a map written by save_map. A saved bloom filter is restored into a new one,
+# kept in seen_file_name if given.
+def load_map(file_name, seen_file_name=None):
+    with open(file_name, "r", encoding="utf-8") as state_file:
+        state = json.load(state_file)
+    if "seen_filter" in state:
+        seen_filter = state.pop("seen_filter")
+        if "file" in seen_filter:
+            seen_filter["file"] = os.path.join(
+                os.path.dirname(file_name), seen_filter["file"]
+            )
+        state["seen"] = bloom_from_state(seen_filter, seen_file_name)
+    else:
+        state["seen"] = set(state["seen"])
+    state.setdefault("revisions", {})
+    state["searched"] = set(tuple(pair) for pair in state["searched"])
+    return state
@@ -0,0 +1,23 @@
+# Computes personalized PageRank over a sparse directed link graph, restarting at the seeds.
+# Pages with no known links (e.g. unexpanded frontier pages) hand their rank back to the seeds.
+def personalized_page_rank(links, seeds, damping=0.85, iterations=20):
+    seeds = list(seeds)
+    if len(seeds) == 0:
+        return {}
+    restart = 1 / len(seeds)
+    ranks = {seed: restart for seed in seeds}
+    for _ in range(iterations):
+        next_ranks = {seed: (1 - damping) * restart for seed in seeds}
+        dangling = 0
+        for node, rank in ranks.items():
+            targets = links.get(node)
+            if not targets:
+                dangling += rank
+                continue
+            share = damping * rank / len(targets)
+            for target in targets:
+                next_ranks[target] = next_ranks.get(target, 0) + share
+        for seed in seeds:
+            next_ranks[seed] += damping * dangling * restart
+        ranks = next_ranks
+    return ranks
@@ -0,0 +1,111 @@
+import random
+
+
+# A small made-up wiki answering the queries WikiClient makes, so the crawler can be
+# run offline. Every query is recorded in calls.
+class FakeWiki:
+    def __init__(self, page_count=60, link_count=8, seed=1):
+        rng = random.Random(seed)
+        self.titles = ["Alpha", "Beta", "Gamma"] + [
+            f"Page{i}" for i in range(page_count)
+        ]
+        self.links = {
+            title: sorted(
+                rng.sample(
+                    [other for other in self.titles if other != title], link_count
+                )
+            )
+            for title in self.titles
+        }
+        self.redirects = {"Alfa": "Alpha"}
+        # titles whose revision has moved on since the crawl
+        self.changed = set()
+        self.calls = []
+
+    # answers every WikiClient query from now on; with a monkeypatch, only until the
+    # test ends
+    def install(self, monkeypatch=None):
+        import wikipediaapi
+
+        def _query(client, page, params):
+            return self.query(dict(params))
+
+        if monkeypatch is None:
+            wikipediaapi.Wikipedia._query = _query
+        else:
+            monkeypatch.setattr(wikipediaapi.Wikipedia, "_query", _query)
+
+    def pageid(self, title):
+        return self.titles.index(title) + 1
+
+    def query(self, params):
+        self.calls.append(params)
+        if params.get("list") == "search":
+            matches = [
+                title
+                for title in self.titles
+                if title.lower().startswith(params["srsearch"].lower()[:3])
+            ]
+            return {"query": {"search": [{"ns": 0, "title": t} for t in matches[:1]]}}
+        if params.get("generator") == "links":
+            return self._generated_links(params["titles"])
+        titles = params["titles"].split("|")
+        query = {"pages": {}}
+        redirects = [
+            {"from": title, "to": self.redirects[title]}
+            for title in titles
+            if title in self.redirects
+        ]
+        if len(redirects) > 0:
+            query["redirects"] = redirects
+        props = params.get("prop", "").split("|")
+        for i, title in enumerate(titles):
+            title = self.redirects.get(title, title)
+            if title not in self.links:
+                query["pages"][str(-1 - i)] = {"ns": 0, "title": title, "missing": ""}
+                continue
+            page = {"pageid": self.pageid(title), "ns": 0, "title": title}
+            if "info" in props:
+                page["lastrevid"] = 1000 + self.pageid(title) + (title in self.changed)
+            if "extracts" in props:
+                page["extract"] = f"{title} is a page about {self.links[title][0]}."
+            if "links" in props:
+                wanted = params.get("pltitles", "").split("|")
+                page["links"] = [
+                    {"ns": 0, "title": link}
+                    for link in self.links[title]
+                    if link in wanted
+                ]
+            query["pages"][str(self.pageid(title))] = page
+        return {"query": query}
+
+    def _generated_links(self, title):
+        title = self.redirects.get(title, title)
+        pages = {
+            str(self.pageid(link)): {
+                "pageid": self.pageid(link),
+                "ns": 0,
+                "title": link,
+            }
+            for link in self.links.get(title, [])
+        }
+        return {"query": {"pages": pages}}
+
+    # the calls made for a kind of query: "summary", "links", "revisions", ...
+    def calls_of(self, kind):
+        return [call for call in self.calls if query_kind(call) == kind]
+
+
+def query_kind(params):
+    props = params.get("prop", "").split("|")
+    if "extracts" in props:
+        return "summary"
+    if params.get("generator") == "links":
+        return "links"
+    if "links" in props:
+        return "links between"
+    if "info" in props:
+        return "revisions"
+    if params.get("list") == "search":
+        return "search"
+    return "titles"
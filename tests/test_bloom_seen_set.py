@@ -0,0 +1,67 @@
+from BloomSeenSet import BloomSeenSet, bloom_from_state
+from map_store import save_map, load_map
+
+
+def test_no_false_negatives_and_few_false_positives():
+    seen = BloomSeenSet(2000, 0.01)
+    seen.update(f"Page {i}" for i in range(2000))
+    assert all(f"Page {i}" in seen for i in range(2000))
+    false_positives = sum(f"Other {i}" in seen for i in range(10000))
+    assert false_positives < 10000 * 0.03
+
+
+def test_repeats_are_not_counted():
+    seen = BloomSeenSet(100, 0.01)
+    seen.update(["Rock", "Jazz", "Rock"])
+    assert len(seen) == 2
+
+
+def test_state_round_trip_keeps_titles():
+    seen = BloomSeenSet(100, 0.01)
+    seen.update(["Rock", "Jazz"])
+    restored = bloom_from_state(seen.to_state())
+    assert "Rock" in restored and "Jazz" in restored
+    assert len(restored) == 2
+
+
+def test_new_file_backed_filter_starts_empty(tmp_path):
+    file_name = str(tmp_path / "seen.bits")
+    seen = BloomSeenSet(1000, 0.01, file_name)
+    seen.add("Rock")
+    seen.close()
+
+    fresh = BloomSeenSet(1000, 0.01, file_name)
+    assert "Rock" not in fresh
+    fresh.close()
+
+
+def test_file_backed_filter_restores_from_its_own_copy(tmp_path):
+    file_name = str(tmp_path / "seen.bits")
+    seen = BloomSeenSet(1000, 0.01, file_name)
+    seen.add("Rock")
+    state = seen.to_state(str(tmp_path / "map.seen"))
+    seen.close()
+    assert "bits" not in state
+
+    # the next crawl clears the shared file, but not the copy
+    BloomSeenSet(1000, 0.01, file_name).close()
+    restored = bloom_from_state(state, file_name)
+    assert "Rock" in restored
+    restored.add("Jazz")
+    restored.close()
+    assert "Jazz" not in bloom_from_state(state)
+
+
+def test_saved_maps_keep_their_own_seen_pages(tmp_path):
+    file_name = str(tmp_path / "seen.bits")
+    for map_name, title in (("first.json", "Rock"), ("second.json", "Jazz")):
+        seen = BloomSeenSet(1000, 0.01, file_name)
+        seen.add(title)
+        save_map(str(tmp_path / map_name), ["Rock"], [], {}, seen, set())
+        seen.close()
+
+    first = load_map(str(tmp_path / "first.json"))["seen"]
+    second = load_map(str(tmp_path / "second.json"), file_name)["seen"]
+    assert "Rock" in first and "Jazz" not in first
+    assert "Jazz" in second and "Rock" not in second
+    second.close()
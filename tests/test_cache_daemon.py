@@ -0,0 +1,98 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from cache_daemon import PageCache, CacheRequestHandler
+from CacheClient import CacheClient
+import threading
+import time
+import pytest
+
+
+# Takes a while over every fetch, so concurrent requests overlap, counting them
+class SlowWiki:
+    def __init__(self):
+        self.fetched = []
+
+    def fetch_summary(self, title):
+        self.fetched.append(title)
+        time.sleep(0.2)
+        return (1, f"{title} summary", 7)
+
+    def fetch_links(self, title):
+        self.fetched.append(title)
+        time.sleep(0.2)
+        return ({f"{title} link": 2}, {})
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(handler, cache=None):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.cache = cache
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"127.0.0.1:{server.server_address[1]}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_concurrent_gets_of_one_page_fetch_it_once():
+    wiki = SlowWiki()
+    cache = PageCache(wiki)
+    thread_count = 16
+    start = threading.Barrier(thread_count)
+    results = []
+
+    def get():
+        start.wait()
+        results.append(cache.get("summary", "Rock"))
+
+    threads = [threading.Thread(target=get) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert wiki.fetched == ["Rock"]
+    assert cache.upstream_count == 1
+    assert len(results) == thread_count
+    assert all(result == results[0] for result in results)
+    assert results[0]["summary"] == "Rock summary"
+
+
+def test_client_reads_through_the_daemon(serve):
+    wiki = SlowWiki()
+    client = CacheClient(serve(CacheRequestHandler, PageCache(wiki)))
+    assert client.summary("Rock") == (1, "Rock summary", 7)
+    assert client.links("Rock") == ({"Rock link": 2}, {})
+    assert client.summary("Rock") == (1, "Rock summary", 7)
+    assert wiki.fetched == ["Rock", "Rock"]
+
+
+# Answers everything with an html error page, like a misconfigured proxy
+class HtmlHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"<html>Bad gateway</html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_client_treats_a_non_json_reply_as_a_miss(serve):
+    client = CacheClient(serve(HtmlHandler))
+    assert client.summary("Rock") is None
+    assert client.links("Rock") is None
+
+
+def test_client_gives_up_on_an_unreachable_daemon():
+    client = CacheClient("127.0.0.1:9", timeout=1)
+    assert client.summary("Rock") is None
+    assert not client.available
@@ -0,0 +1,97 @@
+from EdgeStore import CleaningEdgeStore
+from Edge import Edge
+import influence_map_tui as crawler
+import random
+
+# titles that often contain one another, so many connections consolidate
+TITLES = [
+    "art",
+    "arts",
+    "Art",
+    "pop art",
+    "paint",
+    "painting",
+    "oil",
+    "Oil",
+    "oil paint",
+    "music",
+    "rock",
+    "rock music",
+    "a",
+    "b",
+    "ab",
+    "ba",
+]
+
+
+class Page:
+    def __init__(self, title):
+        self.title = title
+
+
+# Random connections between a random handful of the titles
+def random_connections(seed):
+    rng = random.Random(seed)
+    titles = rng.sample(TITLES, rng.randint(3, len(TITLES)))
+    pages = {title: Page(title) for title in titles}
+    return [
+        (pages[rng.choice(titles)], pages[rng.choice(titles)])
+        for _ in range(rng.randint(1, 30))
+    ]
+
+
+def edge_titles(connections):
+    return set(
+        frozenset((connection.src.title, connection.dest.title))
+        for connection in connections
+    )
+
+
+# The steps of clean() that take a different path for a CleaningEdgeStore
+def clean_batch(pairs, min_connections):
+    connections = [Edge(src, dest, 1) for src, dest in pairs]
+    connections = crawler.remove_cycles(connections)
+    connections = crawler.remove_dead_ends(connections, min_connections)
+    connections = crawler.consolidate_titles(connections)
+    return crawler.remove_cycles(connections)
+
+
+def clean_incremental(pairs, min_connections):
+    store = CleaningEdgeStore(Edge(src, dest, 1) for src, dest in pairs)
+    connections = crawler.remove_dead_ends(list(store), min_connections, store.degrees)
+    connections = crawler.consolidate_related_titles(connections, store.related_titles)
+    return crawler.remove_cycles(connections)
+
+
+def test_incremental_clean_matches_batch():
+    for seed in range(500):
+        pairs = random_connections(seed)
+        for min_connections in (1, 2, 3):
+            assert edge_titles(clean_incremental(pairs, min_connections)) == (
+                edge_titles(clean_batch(pairs, min_connections))
+            ), f"seed {seed}, min_connections {min_connections}"
+
+
+def test_lone_connection_survives_consolidation():
+    pairs = [(Page("rock"), Page("music"))]
+    assert edge_titles(clean_batch(pairs, 1)) == {frozenset(("rock", "music"))}
+    assert edge_titles(clean_incremental(pairs, 1)) == {frozenset(("rock", "music"))}
+
+
+def test_cleaning_store_drops_cycles_and_counts_degrees():
+    rock, music = Page("rock"), Page("music")
+    store = CleaningEdgeStore()
+    store.add(Edge(rock, rock, 1))
+    store.add(Edge(rock, music, 1))
+    store.add(Edge(music, rock, 2))
+    assert len(store) == 1
+    assert store.degrees["rock"] == 3
+    assert store.degrees["music"] == 3
+
+
+def test_cleaning_store_relates_titles_either_way_round():
+    store = CleaningEdgeStore()
+    store.add(Edge(Page("rock music"), Page("art"), 1))
+    store.add(Edge(Page("rock"), Page("arts"), 1))
+    assert ("rock", "rock music") in store.related_titles
+    assert ("art", "arts") in store.related_titles
@@ -0,0 +1,29 @@
+from LshIndex import LshIndex, similarity
+
+ROCK = "Rock music is a broad genre of popular music that originated as rock and roll in the United States"
+ROCK_EDITED = "Rock music is a broad genre of popular music that originated as rock and roll in the United Kingdom"
+JAZZ = "Jazz is a music genre that originated in the African-American communities of New Orleans in the late 19th century"
+
+
+def test_signatures_are_deterministic():
+    assert LshIndex().signature(ROCK) == LshIndex().signature(ROCK)
+    assert LshIndex().signature("...") is None
+
+
+def test_similarity_tracks_shared_text():
+    index = LshIndex()
+    rock = index.signature(ROCK)
+    assert similarity(rock, rock) == 1
+    assert similarity(rock, index.signature(ROCK_EDITED)) > 0.6
+    assert similarity(rock, index.signature(JAZZ)) < 0.2
+
+
+def test_near_duplicates_finds_only_similar_texts():
+    index = LshIndex()
+    index.add("Rock music", index.signature(ROCK))
+    index.add("Jazz", index.signature(JAZZ))
+    assert len(index) == 2
+    assert index.near_duplicates(index.signature(ROCK_EDITED), 0.6) == ["Rock music"]
+    assert (
+        index.near_duplicates(index.signature("Opera is a form of theatre"), 0.6) == []
+    )
@@ -0,0 +1,74 @@
+from MapIndex import MapIndex
+import random
+import pytest
+
+
+def make_state(edges, concepts=()):
+    return {"concepts": list(concepts), "edges": [[a, b, 1] for a, b in edges]}
+
+
+# A random sparse map, possibly in several pieces
+def random_state(seed, page_count=40, edge_count=60):
+    rng = random.Random(seed)
+    titles = [f"Page {i}" for i in range(page_count)]
+    return make_state(
+        [tuple(rng.sample(titles, 2)) for _ in range(edge_count)], titles[:2]
+    )
+
+
+def test_shortest_path_follows_connections_either_way():
+    index = MapIndex(make_state([("A", "B"), ("C", "B"), ("C", "D"), ("A", "D")]))
+    assert index.distance("A", "C") == 2
+    assert index.shortest_path("A", "A") == ["A"]
+    path = index.shortest_path("B", "D")
+    assert len(path) == 3 and path[0] == "B" and path[-1] == "D"
+
+
+def test_unconnected_pages_have_no_path():
+    index = MapIndex(make_state([("A", "B"), ("C", "D")]))
+    assert index.shortest_path("A", "D") is None
+    assert index.distance("A", "D") is None
+    assert index.k_shortest_paths("A", "D") == []
+
+
+def test_resolve_ignores_case_and_rejects_unknown_titles():
+    index = MapIndex(make_state([("Rock music", "Jazz")]))
+    assert index.resolve("rock MUSIC") == "Rock music"
+    with pytest.raises(KeyError):
+        index.resolve("Opera")
+
+
+def test_landmark_distances_match_exact_ones():
+    for seed in range(20):
+        state = random_state(seed)
+        exact = MapIndex(state)
+        landmarks = MapIndex(state, all_pairs_limit=0, landmarks=4)
+        assert exact.is_exact and not landmarks.is_exact
+        for src_title in exact.adjacency:
+            for dst_title in exact.adjacency:
+                expected = exact.distances[src_title].get(dst_title)
+                assert exact.distance(src_title, dst_title) == expected
+                assert landmarks.distance(src_title, dst_title) == expected
+
+
+def test_k_shortest_paths_are_distinct_loopless_and_ordered():
+    for seed in range(20):
+        index = MapIndex(random_state(seed))
+        titles = sorted(index.adjacency)
+        paths = index.k_shortest_paths(titles[0], titles[-1], k=5)
+        lengths = [len(path) for path in paths]
+        assert lengths == sorted(lengths)
+        assert len(set(map(tuple, paths))) == len(paths)
+        for path in paths:
+            assert len(set(path)) == len(path)
+            assert path[0] == titles[0] and path[-1] == titles[-1]
+            for src_title, dst_title in zip(path, path[1:]):
+                assert dst_title in index.adjacency[src_title]
+        if len(paths) > 0:
+            assert len(paths[0]) - 1 == index.distance(titles[0], titles[-1])
+
+
+def test_neighbourhood_stops_at_radius():
+    index = MapIndex(make_state([("A", "B"), ("B", "C"), ("C", "D")]))
+    assert index.neighbourhood("B") == {"B": 0, "A": 1, "C": 1}
+    assert index.neighbourhood("A", 2) == {"A": 0, "B": 1, "C": 2}
@@ -0,0 +1,114 @@
+from PageStore import PageStore
+import threading
+import time
+
+# long enough that a paced prefetch is still waiting when the test takes it
+LONG_INTERVAL = 30
+
+
+# Answers fetches straight away, counting them per title
+class StubWiki:
+    def __init__(self):
+        self.fetched = []
+        self._lock = threading.Lock()
+
+    def fetch_summary(self, title):
+        with self._lock:
+            self.fetched.append(("summary", title))
+        return (1, f"{title} summary", 7)
+
+    def fetch_links(self, title):
+        with self._lock:
+            self.fetched.append(("links", title))
+        return ({f"{title} link": 2}, {})
+
+    def is_blacklisted(self, title):
+        return False
+
+
+def make_store(wiki, **kwargs):
+    options = {
+        "summary_cache_size": 8,
+        "link_cache_size": 8,
+        "prefetch_workers": 2,
+        "prefetch_interval": LONG_INTERVAL,
+    }
+    options.update(kwargs)
+    return PageStore(wiki, **options)
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_prefetched_result_is_handed_over():
+    wiki = StubWiki()
+    store = make_store(wiki, prefetch_interval=0)
+    store.prefetch("Rock")
+    assert wait_for(lambda: len(wiki.fetched) == 2)
+    assert store.summary("Rock") == "Rock summary"
+    assert "Rock link" in store.links("Rock")
+    assert len(wiki.fetched) == 2
+    store.close()
+
+
+def test_take_before_the_fetch_starts_fetches_directly():
+    wiki = StubWiki()
+    store = make_store(wiki)
+    # the first prefetch takes the pacing slot, the second waits its turn
+    store.prefetch("Rock", links=False)
+    store.prefetch("Jazz", links=False)
+    assert wait_for(lambda: ("summary", "Rock") in wiki.fetched)
+
+    started = time.monotonic()
+    assert store.summary("Jazz") == "Jazz summary"
+    assert time.monotonic() - started < LONG_INTERVAL / 2
+    assert "Jazz" not in store._pending["summary"]
+    # the cancelled prefetch never fetches the page a second time
+    time.sleep(0.1)
+    assert wiki.fetched.count(("summary", "Jazz")) == 1
+    store.close()
+
+
+def test_pending_prefetches_are_capped_per_kind():
+    wiki = StubWiki()
+    store = make_store(wiki)
+    for i in range(10):
+        store.prefetch(f"Page {i}", links=False)
+    # half the summary cache, keeping the newest
+    assert list(store._pending["summary"]) == ["Page 6", "Page 7", "Page 8", "Page 9"]
+    # untaken summaries don't stop links being prefetched
+    store.prefetch("Child", summary=False)
+    assert "Child" in store._pending["links"]
+    store.close()
+
+
+def test_pending_prefetches_count_toward_the_cache_size():
+    wiki = StubWiki()
+    store = make_store(wiki)
+    for i in range(3):
+        store.prefetch(f"Page {i}", links=False)
+    assert store._cache_size("summary") == 8 - 3
+    for i in range(8):
+        store.set_summary(f"Known {i}", "summary")
+    assert len(store._summaries) + len(store._pending["summary"]) == 8
+    assert store.known_summary("Known 7") == "summary"
+    store.close()
+
+
+def test_close_stops_prefetching():
+    wiki = StubWiki()
+    store = make_store(wiki)
+    store.prefetch("Rock", links=False)
+    store.prefetch("Jazz", links=False)
+    assert wait_for(lambda: ("summary", "Rock") in wiki.fetched)
+    store.close()
+    assert store._pending == {"summary": {}, "links": {}}
+    store.prefetch("Blues")
+    time.sleep(0.1)
+    assert wiki.fetched == [("summary", "Rock")]
+    # the store still works without prefetching
+    assert store.summary("Blues") == "Blues summary"
@@ -0,0 +1,68 @@
+from fake_wiki import FakeWiki
+from pyvis.network import Network
+import influence_map_tui as crawler
+import glob
+import pytest
+
+
+@pytest.fixture
+def wiki(monkeypatch, tmp_path):
+    wiki = FakeWiki()
+    wiki.install(monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        Network, "show", lambda net, name, **kwargs: net.write_html(name)
+    )
+    monkeypatch.setattr(crawler, "print", lambda *args, **kwargs: None, raising=False)
+    monkeypatch.setattr(crawler, "SLEEPER_DELAY", 0)
+    monkeypatch.setattr(crawler, "PREFETCH_WORKERS", 0)
+    # far fewer summaries than the map has pages
+    monkeypatch.setattr(crawler, "SUMMARY_CACHE_SIZE", 5)
+    (tmp_path / "concepts.txt").write_text("Alpha\nBeta\n")
+    return wiki
+
+
+# Runs the crawler as if from the command line, in a fresh process
+def run_crawler(monkeypatch, args):
+    monkeypatch.setattr(crawler, "wiki_client", None)
+    monkeypatch.setattr(crawler, "page_store", None)
+    crawler.main(["concepts.txt", "--seed", "1"] + args)
+
+
+def test_refresh_of_unchanged_map_only_checks_revisions(wiki, monkeypatch):
+    run_crawler(monkeypatch, [])
+    (map_file,) = glob.glob("*.json")
+    wiki.calls.clear()
+
+    run_crawler(monkeypatch, ["--extend", map_file, "--refresh"])
+
+    assert len(wiki.calls_of("revisions")) > 0
+    assert wiki.calls_of("summary") == []
+    assert wiki.calls_of("links") == []
+    assert wiki.calls_of("links between") == []
+    assert len(wiki.calls) == len(wiki.calls_of("revisions")) + len(
+        wiki.calls_of("titles")
+    )
+
+
+def test_refresh_refetches_changed_pages(wiki, monkeypatch):
+    run_crawler(monkeypatch, [])
+    (map_file,) = glob.glob("*.json")
+    wiki.changed.add("Alpha")
+    wiki.calls.clear()
+
+    run_crawler(monkeypatch, ["--extend", map_file, "--refresh"])
+
+    # the changed concept's pairs are searched again, which can find new pages too
+    assert "Alpha" in [call["titles"] for call in wiki.calls_of("summary")]
+
+
+def test_extending_best_first_map_skips_searched_pairs(wiki, monkeypatch):
+    monkeypatch.setattr(crawler, "BEST_FIRST_SEARCH", True)
+    run_crawler(monkeypatch, [])
+    (map_file,) = glob.glob("*.json")
+    wiki.calls.clear()
+
+    run_crawler(monkeypatch, ["--extend", map_file])
+
+    assert wiki.calls_of("links") == []
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+import os
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+
+# runs the TUI offline against the fake wiki, printing nothing
+RUN_CRAWLER = """
+import sys
+from fake_wiki import FakeWiki
+from pyvis.network import Network
+import influence_map_tui as crawler
+FakeWiki().install()
+Network.show = lambda net, name, **kwargs: net.write_html(name)
+crawler.print = lambda *args, **kwargs: None
+crawler.SLEEPER_DELAY = 0
+crawler.PREFETCH_WORKERS = 0
+crawler.BEST_FIRST_SEARCH = True
+crawler.main(sys.argv[1:])
+"""
+
+
+def run_crawler(directory, hash_seed, args):
+    environment = dict(os.environ)
+    environment["PYTHONHASHSEED"] = str(hash_seed)
+    environment["PYTHONPATH"] = os.pathsep.join([REPO_DIR, TESTS_DIR])
+    subprocess.run(
+        [sys.executable, "-c", RUN_CRAWLER, "concepts.txt", "--seed", "3"] + args,
+        cwd=directory,
+        env=environment,
+        check=True,
+        capture_output=True,
+    )
+
+
+# A seeded best-first crawl recorded under one string hash seed replays under
+# another, and makes the same map under the same file names
+def test_seeded_crawl_replays_under_another_hash_seed(tmp_path):
+    for directory in ("record", "replay"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "concepts.txt").write_text("Beta\nGamma\nAlpha\n")
+    cassette = str(tmp_path / "crawl.gz")
+
+    run_crawler(tmp_path / "record", 1, ["--record", cassette])
+    run_crawler(tmp_path / "replay", 2, ["--replay", cassette])
+
+    map_file = "influence_map(Alpha,Beta,Gamma).json"
+    recorded = (tmp_path / "record" / map_file).read_text()
+    assert (tmp_path / "replay" / map_file).read_text() == recorded